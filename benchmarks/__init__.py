@@ -0,0 +1,7 @@
+"""Benchmarks of the tools' scaling behaviour.
+
+Run them from the repository root, e.g.:
+
+    python -m benchmarks.fleet
+    python -m benchmarks.query
+"""
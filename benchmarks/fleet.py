@@ -0,0 +1,268 @@
+"""Benchmark sysrpc and sysrsync against a simulated fleet.
+
+Each run executes in a fresh interpreter, with ssh and rsync replaced by
+fleet.sh, so that wall time, peak memory and the CPU time spent by the
+tool itself (i.e. the scheduling overhead, as the simulated remote
+commands run in child processes) are measured in isolation.
+"""
+
+from argparse import ArgumentParser, Namespace
+from importlib import import_module
+from json import dumps, loads
+from math import ceil
+from os import environ
+from pathlib import Path
+from random import Random
+from re import compile as compile_regex
+from resource import RUSAGE_SELF, getrusage
+from subprocess import run
+from sys import argv, executable
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import NamedTuple
+
+from homeinfotools import ssh
+
+from benchmarks.report import report
+
+
+__all__ = ["main"]
+
+
+SCRIPT = Path(__file__).with_name("fleet.sh")
+SYSTEMS_METRIC = compile_regex(r'^homeinfotools_systems\{.*status="(.+)"\} (\d+)$')
+
+
+class Tool(NamedTuple):
+    """A tool to benchmark."""
+
+    module: str
+    step: str
+    args: list[str]
+    operands: list[str]
+
+
+class Model(NamedTuple):
+    """A worker model to benchmark."""
+
+    processes: int
+    args: list[str]
+    round_trips: int = 1
+
+
+TOOLS = {
+    "sysrpc": Tool("homeinfotools.rpc.main", "execute", ["-X", "true"], []),
+    "sysrsync": Tool(
+        "homeinfotools.filetransfer.main", "rsync", ["-S"], [__file__, "/tmp/bench"]
+    ),
+}
+MODELS = {
+    "p64": Model(64, []),
+    "p256": Model(256, []),
+    "p256-multiplex": Model(256, ["-M"], round_trips=2),
+    "p256-limited": Model(256, ["-l", "{step}=32"]),
+}
+
+
+def get_args() -> Namespace:
+    """Returns parsed CLI arguments."""
+
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "-n",
+        "--systems",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+        metavar="n",
+        help="fleet sizes to benchmark",
+    )
+    parser.add_argument(
+        "-t",
+        "--tool",
+        nargs="+",
+        choices=TOOLS,
+        default=list(TOOLS),
+        help="tools to benchmark",
+    )
+    parser.add_argument(
+        "-m",
+        "--model",
+        nargs="+",
+        choices=MODELS,
+        default=list(MODELS),
+        help="worker models to benchmark",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        metavar="seconds",
+        help="duration of each simulated remote command",
+    )
+    parser.add_argument(
+        "--offline-rate",
+        type=float,
+        default=0.05,
+        metavar="ratio",
+        help="share of unreachable systems",
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.02,
+        metavar="ratio",
+        help="share of systems whose commands fail",
+    )
+    parser.add_argument(
+        "--stdout",
+        type=int,
+        default=0,
+        metavar="bytes",
+        help="bytes each simulated remote command writes to stdout",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the simulated fleet"
+    )
+    parser.add_argument(
+        "--json", type=Path, metavar="file", help="save the results as JSON"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        metavar="file",
+        help="compare the wall times with previously saved results",
+    )
+    return parser.parse_args()
+
+
+def get_env(systems: int, args: Namespace, bindir: Path) -> dict[str, str]:
+    """Returns the environment of a run on the simulated fleet."""
+
+    random = Random(args.seed)
+    offline, failing = [], []
+
+    for system in range(1, systems + 1):
+        if (value := random.random()) < args.offline_rate:
+            offline.append(str(system))
+        elif value < args.offline_rate + args.failure_rate:
+            failing.append(str(system))
+
+    return {
+        **environ,
+        "FAKE_FLEET_BIN": str(bindir),
+        "FAKE_FLEET_LATENCY": str(args.latency),
+        "FAKE_FLEET_OFFLINE": " ".join(offline),
+        "FAKE_FLEET_FAILING": " ".join(failing),
+        "FAKE_FLEET_STDOUT": str(args.stdout),
+    }
+
+
+def benchmark(tool: str, systems: int, model: str, env: dict[str, str]) -> dict:
+    """Runs a benchmark in a separate interpreter and returns its measurements."""
+
+    completed_process = run(
+        [executable, "-m", "benchmarks.fleet", "--run", tool, str(systems), model],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return loads(completed_process.stdout.splitlines()[-1])
+
+
+def run_tool(tool: str, systems: int, model: str) -> dict:
+    """Runs the tool on the simulated fleet within this interpreter."""
+
+    bindir = Path(environ["FAKE_FLEET_BIN"])
+    ssh.SSH = str(bindir / "ssh")
+    ssh.RSYNC = str(bindir / "rsync")
+    main = import_module(TOOLS[tool].module).main
+
+    with TemporaryDirectory() as tmp:
+        metrics = Path(tmp) / "metrics.prom"
+        argv[1:] = [
+            *(arg.format(step=TOOLS[tool].step) for arg in MODELS[model].args),
+            "-p",
+            str(MODELS[model].processes),
+            "--metrics",
+            str(metrics),
+            # Unreachable systems stay unreachable, retrying them only adds delays.
+            "--retry",
+            "connect=0",
+            *TOOLS[tool].args,
+            *map(str, range(1, systems + 1)),
+            *TOOLS[tool].operands,
+        ]
+        start = perf_counter()
+        main()
+        wall = perf_counter() - start
+        statuses = {
+            match.group(1): int(match.group(2))
+            for line in metrics.read_text(encoding="utf-8").splitlines()
+            if (match := SYSTEMS_METRIC.match(line))
+        }
+
+    usage = getrusage(RUSAGE_SELF)
+    return {
+        "wall": wall,
+        "cpu": usage.ru_utime + usage.ru_stime,
+        "rss": usage.ru_maxrss / 1024,
+        "statuses": statuses,
+    }
+
+
+def main() -> None:
+    """Runs the benchmarks."""
+
+    if argv[1:2] == ["--run"]:
+        print(dumps(run_tool(argv[2], int(argv[3]), argv[4])))
+        return
+
+    args = get_args()
+    rows = []
+
+    with TemporaryDirectory() as bindir:
+        for name in ("ssh", "rsync"):
+            (Path(bindir) / name).symlink_to(SCRIPT)
+
+        for systems in args.systems:
+            env = get_env(systems, args, Path(bindir))
+
+            for tool in args.tool:
+                for model in args.model:
+                    result = benchmark(tool, systems, model, env)
+                    ideal = (
+                        ceil(systems / MODELS[model].processes)
+                        * MODELS[model].round_trips
+                        * args.latency
+                    )
+                    rows.append(
+                        {
+                            "tool": tool,
+                            "systems": systems,
+                            "model": model,
+                            "wall [s]": result["wall"],
+                            "overhead [s]": result["wall"] - ideal,
+                            "systems/s": systems / result["wall"],
+                            "cpu/system [ms]": result["cpu"] / systems * 1000,
+                            "peak rss [MiB]": result["rss"],
+                            "statuses": " ".join(
+                                f"{status}={count}"
+                                for status, count in sorted(result["statuses"].items())
+                            ),
+                        }
+                    )
+
+    report(
+        rows,
+        list(rows[0]) if rows else [],
+        key=("tool", "systems", "model"),
+        metric="wall [s]",
+        json=args.json,
+        baseline=args.baseline,
+    )
+
+
+if __name__ == "__main__":
+    main()
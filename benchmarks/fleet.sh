@@ -0,0 +1,44 @@
+#!/bin/sh
+# Stand-in for ssh and rsync, simulating a fleet of systems.
+#
+# Invoked as "ssh" or "rsync" (via symlinks). Configured by:
+#   FAKE_FLEET_LATENCY  seconds each remote command takes
+#   FAKE_FLEET_OFFLINE  space-separated IDs of unreachable systems
+#   FAKE_FLEET_FAILING  space-separated IDs of systems whose commands fail
+#   FAKE_FLEET_STDOUT   bytes each remote command writes to stdout
+
+system=
+control=
+
+for arg; do
+    case $arg in
+        -O) control=1 ;;
+        *.terminals.homeinfo.intra*) system=${arg%%.*}; system=${system##*@} ;;
+    esac
+done
+
+# Closing a control master is local and immediate.
+[ -n "$control" ] && exit 0
+
+sleep "${FAKE_FLEET_LATENCY:-0}"
+
+case " $FAKE_FLEET_OFFLINE " in
+    *" $system "*)
+        echo "ssh: connect to host $system port 22: Connection refused" >&2
+        exit 255
+        ;;
+esac
+
+if [ "${FAKE_FLEET_STDOUT:-0}" -gt 0 ]; then
+    head -c "$FAKE_FLEET_STDOUT" /dev/zero | tr '\0' x
+fi
+
+case " $FAKE_FLEET_FAILING " in
+    *" $system "*)
+        echo "error: simulated failure" >&2
+        [ "${0##*/}" = rsync ] && exit 23
+        exit 1
+        ;;
+esac
+
+exit 0
@@ -0,0 +1,177 @@
+"""Check sysquery's cache refresh against a local HIS stand-in.
+
+A local HTTP server stands in for the HIS session and system list
+endpoints. sysquery runs in child processes with a temporary home
+directory, so that neither the real session nor cache is touched.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from os import environ
+from pathlib import Path
+from subprocess import DEVNULL, CompletedProcess, run
+from sys import argv, executable
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import monotonic, sleep
+
+from benchmarks.query import make_systems
+
+
+__all__ = ["main"]
+
+
+ACCOUNT, PASSWD, TOKEN, ETAG = "bob", "secret", "token", '"v1"'
+URL_VARIABLE = "HIS_STANDIN_URL"
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves the HIS session and system list endpoints."""
+
+    def do_POST(self) -> None:
+        """Logs in."""
+        length = int(self.headers.get("Content-Length", 0))
+        credentials = loads(self.rfile.read(length) or b"{}")
+        self.server.requests.append(("POST", self.path, None))
+
+        if credentials != {"account": ACCOUNT, "passwd": PASSWD}:
+            self.send_response(401)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Set-Cookie", f"session={TOKEN}; Path=/")
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        """Lists the systems."""
+        if f"session={TOKEN}" not in self.headers.get("Cookie", ""):
+            self.server.requests.append(("GET", self.path, 401))
+            self.send_response(401)
+            self.end_headers()
+            return
+
+        if self.headers.get("If-None-Match") == ETAG:
+            self.server.requests.append(("GET", self.path, 304))
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.server.requests.append(("GET", self.path, 200))
+        body = dumps(make_systems(100, 0)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_) -> None:
+        """Keeps the output clean."""
+
+
+def run_child() -> int:
+    """Runs sysquery or a login against the stand-in."""
+
+    from homeinfotools.his import HISSession, session
+    from homeinfotools.query import functions
+
+    session.URL = f"{environ[URL_VARIABLE]}/session"
+    functions.SYSTEMS_URL = f"{environ[URL_VARIABLE]}/list/systems"
+    functions.REFRESH_MODULE = "benchmarks.his"
+
+    if argv[1:] == ["--login"]:
+        with HISSession(ACCOUNT, PASSWD):
+            return 0
+
+    from homeinfotools.query.main import main
+
+    return main() or 0
+
+
+def sysquery(env: dict[str, str], *options: str) -> CompletedProcess:
+    """Runs sysquery against the stand-in."""
+
+    return run(
+        [executable, "-m", "benchmarks.his", *options],
+        env=env,
+        stdin=DEVNULL,
+        capture_output=True,
+        text=True,
+    )
+
+
+def wait_for(path: Path, *, timeout: float = 10) -> bool:
+    """Waits for the file to be removed."""
+
+    deadline = monotonic() + timeout
+
+    while path.exists():
+        if monotonic() > deadline:
+            return False
+
+        sleep(0.1)
+
+    return True
+
+
+def main() -> int:
+    """Runs the checks and returns the amount of failed checks."""
+
+    if URL_VARIABLE in environ:
+        return run_child()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    server.requests = []
+    Thread(target=server.serve_forever, daemon=True).start()
+    failed = 0
+
+    def check(name: str, condition: bool) -> None:
+        nonlocal failed
+        failed += not condition
+        print("ok    " if condition else "FAILED", name, flush=True)
+
+    with TemporaryDirectory() as home:
+        env = {
+            **environ,
+            "HOME": home,
+            URL_VARIABLE: f"http://127.0.0.1:{server.server_port}",
+        }
+        cache = Path(home) / ".cache"
+        lock = cache / "sysquery.lock"
+
+        sysquery(env, "--login")
+        check("login stores a session", (cache / "his.session").exists())
+
+        server.requests.clear()
+        result = sysquery(env, "--count")
+        check("initial download", result.stdout.strip() == "100")
+        check(
+            "cached session is used",
+            not any(method == "POST" for method, *_ in server.requests),
+        )
+
+        server.requests.clear()
+        result = sysquery(env, "--count", "--stale", "--cache-time", "0")
+        check("stale answer", result.stdout.strip() == "100")
+        check("background refresh removes its lock", wait_for(lock))
+        check(
+            "background refresh is conditional",
+            ("GET", "/list/systems", 304) in server.requests,
+        )
+        check("background refresh logs", (cache / "sysquery-refresh.log").exists())
+
+        (cache / "his.session").unlink()
+        server.requests.clear()
+        result = sysquery(
+            env, "--count", "--stale", "--cache-time", "0", "-U", ACCOUNT
+        )
+        check("no session warns", "No cached HIS session" in result.stderr)
+        check("no session spawns no refresh", not lock.exists())
+
+    server.shutdown()
+    return failed
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+"""Benchmark filtering of systems by sysquery on a synthetic cache."""
+
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from random import Random
+from sys import argv
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable
+
+from homeinfotools.query.argparse import get_args as get_query_args
+from homeinfotools.query.cache import store_systems
+from homeinfotools.query.functions import filter_systems, load_cached_systems
+
+from benchmarks.report import report
+
+
+__all__ = ["main"]
+
+
+CITIES = ["Berlin", "Hamburg", "Hannover", "Köln", "München", "Leipzig", "Bremen"]
+STREETS = ["Hauptstraße", "Bahnhofstraße", "Gartenweg", "Am Markt", "Schulstraße"]
+TYPES = ["DDB", "exhibition", "info"]
+QUERIES = {
+    "all": [],
+    "ids": ["-i", *map(str, range(1, 20000, 200))],
+    "city": ["--city", "berlin"],
+    "customer": ["-C", "Company 7"],
+    "expression": [
+        "-F",
+        "os=arch and (city~berlin or zip=1*) and not type=DDB",
+    ],
+}
+
+
+def get_args() -> Namespace:
+    """Returns parsed CLI arguments."""
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n",
+        "--systems",
+        type=int,
+        default=50000,
+        metavar="n",
+        help="amount of synthetic systems",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=5,
+        metavar="n",
+        help="runs per query of which the fastest is reported",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the synthetic systems"
+    )
+    parser.add_argument(
+        "--json", type=Path, metavar="file", help="save the results as JSON"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        metavar="file",
+        help="compare the timings with previously saved results",
+    )
+    return parser.parse_args()
+
+
+def make_systems(amount: int, seed: int) -> list[dict]:
+    """Returns synthetic systems resembling those of the HIS API."""
+
+    random = Random(seed)
+    systems = []
+
+    for ident in range(1, amount + 1):
+        customer = random.randrange(1, 500)
+        systems.append(
+            {
+                "id": ident,
+                "operatingSystem": random.choice(["arch", "arch", "windows"]),
+                "serialNumber": f"SN{random.randrange(10**8):08d}",
+                "deployment": None
+                if random.random() < 0.1
+                else {
+                    "id": ident * 2,
+                    "type": random.choice(TYPES),
+                    "customer": {
+                        "id": customer,
+                        "company": {
+                            "name": f"Company {customer}",
+                            "abbreviation": f"C{customer}",
+                        },
+                    },
+                    "address": {
+                        "street": random.choice(STREETS),
+                        "houseNumber": str(random.randrange(1, 200)),
+                        "zipCode": f"{random.randrange(1000, 99999):05d}",
+                        "city": random.choice(CITIES),
+                    },
+                },
+            }
+        )
+
+    return systems
+
+
+def best_of(repeat: int, function: Callable[[], int]) -> tuple[float, int]:
+    """Returns the fastest time of the function and its result."""
+
+    timings = []
+
+    for _ in range(repeat):
+        start = perf_counter()
+        result = function()
+        timings.append(perf_counter() - start)
+
+    return min(timings), result
+
+
+def query_args(options: list[str]) -> Namespace:
+    """Returns sysquery's arguments for the given options."""
+
+    argv[1:] = options
+    return get_query_args()
+
+
+def main() -> None:
+    """Runs the benchmarks."""
+
+    args = get_args()
+    systems = make_systems(args.systems, args.seed)
+    rows = []
+
+    with TemporaryDirectory() as tmp:
+        cache = Path(tmp) / "sysquery.sqlite"
+        seconds, _ = best_of(1, lambda: store_systems(cache, systems) or 0)
+        rows.append({"benchmark": "store cache", "seconds": seconds})
+
+        for name, options in QUERIES.items():
+            query = query_args(options)
+            query.cache_file = cache
+            seconds, matches = best_of(
+                args.repeat, lambda: sum(1 for _ in filter_systems(systems, query))
+            )
+            rows.append(
+                {"benchmark": f"filter {name}", "seconds": seconds, "matches": matches}
+            )
+            seconds, matches = best_of(
+                args.repeat,
+                lambda: sum(
+                    1 for _ in filter_systems(load_cached_systems(query), query)
+                ),
+            )
+            rows.append(
+                {"benchmark": f"cache {name}", "seconds": seconds, "matches": matches}
+            )
+
+    for row in rows:
+        row["per system [µs]"] = row["seconds"] / args.systems * 1e6
+
+    report(
+        rows,
+        ["benchmark", "seconds", "per system [µs]", "matches"],
+        key=("benchmark",),
+        metric="seconds",
+        json=args.json,
+        baseline=args.baseline,
+    )
+
+
+if __name__ == "__main__":
+    main()
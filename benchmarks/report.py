@@ -0,0 +1,75 @@
+"""Reporting of benchmark results."""
+
+from json import dump, load
+from pathlib import Path
+from typing import Sequence
+
+
+__all__ = ["report"]
+
+
+def report(
+    rows: list[dict],
+    columns: Sequence[str],
+    *,
+    key: Sequence[str],
+    metric: str,
+    json: Path | None = None,
+    baseline: Path | None = None,
+) -> None:
+    """Prints the rows as a table, optionally comparing
+    the metric with a baseline and saving them as JSON.
+    """
+
+    table = rows
+
+    if baseline is not None:
+        with baseline.open("r", encoding="utf-8") as file:
+            previous = {tuple(row[k] for k in key): row for row in load(file)}
+
+        table = [
+            {**row, "vs. baseline": compare(row, previous, key, metric)}
+            for row in rows
+        ]
+        columns = [*columns, "vs. baseline"]
+
+    widths = [
+        max(len(column), *(len(format_value(row.get(column))) for row in table))
+        for column in columns
+    ]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+
+    for row in table:
+        print(
+            "  ".join(
+                format_value(row.get(column)).rjust(width)
+                for column, width in zip(columns, widths)
+            )
+        )
+
+    if json is not None:
+        with json.open("w", encoding="utf-8") as file:
+            dump(rows, file, indent=2)
+
+
+def compare(
+    row: dict, previous: dict[tuple, dict], key: Sequence[str], metric: str
+) -> str | None:
+    """Returns the metric relative to the baseline."""
+
+    if (old := previous.get(tuple(row[k] for k in key))) is None:
+        return None
+
+    return f"{row[metric] / old[metric]:.2f}x"
+
+
+def format_value(value) -> str:
+    """Formats a table cell."""
+
+    if value is None:
+        return "-"
+
+    if isinstance(value, float):
+        return f"{value:.3f}"
+
+    return str(value)
@@ -0,0 +1,162 @@
+"""Bounded capturing of subprocess output."""
+
+from asyncio import StreamReader
+from pathlib import Path
+from subprocess import CompletedProcess
+from sys import stderr, stdout
+from typing import BinaryIO, Sequence, TextIO
+
+
+__all__ = ["BoundedOutput", "CapturedProcess", "LinePrinter", "capture", "echoes"]
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BoundedOutput:
+    """Keeps the head and tail of a stream in memory
+    and optionally spills all of it to a file.
+    """
+
+    __slots__ = ("limit", "path", "file", "head", "tail", "size")
+
+    def __init__(self, limit: int | None = None, path: Path | None = None):
+        """Sets the amount of bytes to keep in memory and the spill file."""
+        self.limit = limit
+        self.path = path
+        self.file: BinaryIO | None = None
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        """Adds a chunk of the stream."""
+        self.size += len(chunk)
+
+        if self.path is not None:
+            if self.file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.file = self.path.open("wb")
+
+            self.file.write(chunk)
+
+        if self.limit is None:
+            self.head += chunk
+            return
+
+        if (free := self.limit // 2 - len(self.head)) > 0:
+            self.head += chunk[:free]
+            chunk = chunk[free:]
+
+        self.tail += chunk
+
+        if (excess := len(self.tail) - (self.limit - self.limit // 2)) > 0:
+            del self.tail[:excess]
+
+    def close(self) -> None:
+        """Closes the spill file."""
+        if self.file is not None:
+            self.file.close()
+
+    @property
+    def omitted(self) -> int:
+        """Returns the amount of bytes not kept in memory."""
+        return self.size - len(self.head) - len(self.tail)
+
+    @property
+    def logged(self) -> bool:
+        """Determines whether the stream was spilled to a file."""
+        return self.file is not None
+
+    def text(self) -> str:
+        """Returns the kept output, marking omitted bytes."""
+        if not (omitted := self.omitted):
+            return (self.head + self.tail).decode(errors="replace")
+
+        see = f", see {self.path}" if self.logged else ""
+        return (
+            self.head.decode(errors="replace")
+            + f"\n[... {omitted} bytes omitted{see} ...]\n"
+            + self.tail.decode(errors="replace")
+        )
+
+    def to_json(self) -> dict:
+        """Returns a JSON-ish summary of the stream."""
+        json = {"bytes": self.size, "omitted": self.omitted}
+
+        if self.logged:
+            json["log"] = str(self.path)
+
+        return json
+
+
+class LinePrinter:
+    """Prints complete lines of a stream with a prefix as soon as they arrive."""
+
+    __slots__ = ("prefix", "file", "partial")
+
+    def __init__(self, prefix: str, file: TextIO):
+        """Sets the line prefix and the file to print to."""
+        self.prefix = prefix
+        self.file = file
+        self.partial = b""
+
+    def write(self, chunk: bytes) -> None:
+        """Prints the lines completed by the chunk."""
+        *lines, self.partial = (self.partial + chunk).split(b"\n")
+
+        for line in lines:
+            self.print(line)
+
+    def close(self) -> None:
+        """Prints an incomplete last line."""
+        if self.partial:
+            self.print(self.partial)
+            self.partial = b""
+
+    def print(self, line: bytes) -> None:
+        """Prints a single line."""
+        print(self.prefix, line.decode(errors="replace"), file=self.file, flush=True)
+
+
+class CapturedProcess(CompletedProcess):
+    """A completed process with bounded output."""
+
+    def __init__(
+        self,
+        args: Sequence[str],
+        returncode: int,
+        stdout: BoundedOutput,
+        stderr: BoundedOutput,
+    ):
+        super().__init__(args, returncode, stdout.text(), stderr.text())
+        self.output = {
+            name: output.to_json()
+            for name, output in (("stdout", stdout), ("stderr", stderr))
+            if output.omitted or output.logged
+        }
+        self.attempts: list[dict] = []
+
+
+async def capture(
+    stream: StreamReader, output: BoundedOutput, echo: LinePrinter | None = None
+) -> None:
+    """Reads the stream into the output, optionally echoing its lines."""
+
+    try:
+        while chunk := await stream.read(CHUNK_SIZE):
+            output.write(chunk)
+
+            if echo is not None:
+                echo.write(chunk)
+    finally:
+        output.close()
+
+        if echo is not None:
+            echo.close()
+
+
+def echoes(prefix: str) -> tuple[LinePrinter, LinePrinter]:
+    """Returns line printers for stdout and stderr with the given prefix."""
+
+    return LinePrinter(prefix, stdout), LinePrinter(prefix, stderr)
@@ -3,7 +3,11 @@
 from subprocess import CompletedProcess
 
 
-__all__ = ["RemoteProcessError", "SSHConnectionError"]
+__all__ = ["PackageCacheError", "RemoteProcessError", "SSHConnectionError"]
+
+
+class PackageCacheError(Exception):
+    """Indicates that the package cache could not be prepared."""
 
 
 class RemoteProcessError(Exception):
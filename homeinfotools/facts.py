@@ -0,0 +1,202 @@
+"""Facts about systems and their on-disk cache."""
+
+from contextlib import closing
+from json import dumps, loads
+from pathlib import Path
+from re import IGNORECASE, compile as compile_regex
+from sqlite3 import Connection, connect
+from time import time
+from typing import Iterable
+
+from homeinfotools.os import CACHE_DIR
+
+
+__all__ = [
+    "COMMAND",
+    "FACTS_CACHE",
+    "compare_versions",
+    "load_facts",
+    "parse_facts",
+    "store_facts",
+]
+
+
+FACTS_CACHE = CACHE_DIR / "sysfacts.sqlite"
+COMMAND = r"""export LC_ALL=C
+printf 'kernel\t%s\n' "$(uname -r)"
+printf 'hostname\t%s\n' "$(uname -n)"
+printf 'uptime\t%s\n' "$(cut -d ' ' -f 1 /proc/uptime)"
+df -Pk / | awk 'NR == 2 {print "disk_size\t" $2; print "disk_free\t" $4}'
+awk '$1 == "MemTotal:" {print "memory\t" $2}' /proc/meminfo
+pacman -Q | awk '{print "package\t" $1 "\t" $2}'"""
+# Sizes are reported in KiB and stored in bytes.
+NUMERIC = {
+    "uptime": float,
+    "disk_size": lambda kib: int(kib) * 1024,
+    "disk_free": lambda kib: int(kib) * 1024,
+    "memory": lambda kib: int(kib) * 1024,
+}
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    system INTEGER PRIMARY KEY,
+    gathered REAL NOT NULL,
+    json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS packages (
+    system INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    PRIMARY KEY (system, name)
+);
+CREATE INDEX IF NOT EXISTS packages_name ON packages (name);
+"""
+SEGMENTS = compile_regex(r"\d+|[a-z]+", flags=IGNORECASE)
+
+
+def parse_facts(text: str) -> dict:
+    """Parses the output of the facts command."""
+
+    facts = {"packages": {}}
+
+    for line in text.splitlines():
+        key, _, value = line.partition("\t")
+
+        if key == "package":
+            name, _, version = value.partition("\t")
+            facts["packages"][name] = version
+        elif (converter := NUMERIC.get(key)) is not None:
+            try:
+                facts[key] = converter(value)
+            except ValueError:
+                facts[key] = None
+        elif key:
+            facts[key] = value
+
+    return facts
+
+
+def open_cache(path: Path) -> Connection:
+    """Opens the facts cache, creating its schema if necessary."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = connect(path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def store_facts(path: Path, system: int, facts: dict) -> None:
+    """Replaces the facts of the given system."""
+
+    packages = facts.get("packages") or {}
+    facts = {key: value for key, value in facts.items() if key != "packages"}
+
+    with closing(open_cache(path)) as connection, connection:
+        connection.execute(
+            "REPLACE INTO facts (system, gathered, json) VALUES (?, ?, ?)",
+            (system, time(), dumps(facts, separators=(",", ":"))),
+        )
+        connection.execute("DELETE FROM packages WHERE system = ?", (system,))
+        connection.executemany(
+            "INSERT INTO packages (system, name, version) VALUES (?, ?, ?)",
+            ((system, name, version) for name, version in packages.items()),
+        )
+
+
+def load_facts(
+    path: Path, *, max_age: float, packages: Iterable[str] = ()
+) -> dict[int, dict]:
+    """Returns the facts of all systems gathered within
+    the last <max_age> seconds, including the versions
+    of the given packages.
+    """
+
+    if not path.exists():
+        return {}
+
+    facts = {}
+    packages = list(packages)
+
+    with closing(open_cache(path)) as connection:
+        for system, gathered, json in connection.execute(
+            "SELECT system, gathered, json FROM facts WHERE gathered >= ?",
+            (time() - max_age,),
+        ):
+            facts[system] = {**loads(json), "gathered": gathered, "packages": {}}
+
+        if packages:
+            for system, name, version in connection.execute(
+                "SELECT system, name, version FROM packages"
+                f" WHERE name IN ({', '.join('?' * len(packages))})",
+                packages,
+            ):
+                if system in facts:
+                    facts[system]["packages"][name] = version
+
+    return facts
+
+
+def compare_versions(version: str, other: str) -> int:
+    """Compares two package versions like pacman's vercmp.
+
+    Returns -1 if version is older, 1 if it is newer and 0 if they are equal.
+    """
+
+    if version == other:
+        return 0
+
+    epoch, version, release = split_version(version)
+    other_epoch, other, other_release = split_version(other)
+
+    if result := compare_segments(epoch, other_epoch):
+        return result
+
+    if result := compare_segments(version, other):
+        return result
+
+    if release is None or other_release is None:
+        return 0
+
+    return compare_segments(release, other_release)
+
+
+def split_version(version: str) -> tuple[str, str, str | None]:
+    """Splits a version into epoch, version and release."""
+
+    epoch, colon, rest = version.partition(":")
+
+    if not colon or not epoch.isdigit():
+        epoch, rest = "0", version
+
+    version, dash, release = rest.rpartition("-")
+
+    if not dash:
+        return epoch, release, None
+
+    return epoch, version, release
+
+
+def compare_segments(version: str, other: str) -> int:
+    """Compares versions by their numeric and alphabetic segments."""
+
+    segments, other_segments = SEGMENTS.findall(version), SEGMENTS.findall(other)
+
+    for segment, other_segment in zip(segments, other_segments):
+        if segment.isdigit() != other_segment.isdigit():
+            # Numeric segments are newer than alphabetic ones.
+            return 1 if segment.isdigit() else -1
+
+        if segment.isdigit():
+            segment, other_segment = int(segment), int(other_segment)
+
+        if segment != other_segment:
+            return 1 if segment > other_segment else -1
+
+    if len(segments) == len(other_segments):
+        return 0
+
+    longer = 1 if len(segments) > len(other_segments) else -1
+    rest = (segments if longer > 0 else other_segments)[
+        min(len(segments), len(other_segments))
+    ]
+    # A trailing alphabetic segment denotes a pre-release, e.g. 1.0alpha < 1.0.
+    return -longer if rest.isalpha() else longer
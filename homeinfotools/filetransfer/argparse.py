@@ -1,9 +1,12 @@
 """Argument parsing."""
 
-from argparse import ArgumentParser, Namespace
-from multiprocessing import cpu_count
+from argparse import ArgumentError, ArgumentParser, Namespace
 from pathlib import Path
 
+from homeinfotools.filetransfer.relay import seeds
+from homeinfotools.limiter import step_limit
+from homeinfotools.retry import retry_policy
+
 
 __all__ = ["get_args"]
 
@@ -12,40 +15,215 @@ def get_args() -> Namespace:
     """Returns parsed CLI arguments."""
 
     parser = ArgumentParser(description="Transfer files from and to systems.")
+    # The destination is not needed when retrieving into a store. It can only
+    # be optional then, since it would otherwise be taken for the source.
+    store = ArgumentParser(add_help=False, exit_on_error=False)
+    store.add_argument("-S", "--send", action="store_true")
+    store.add_argument("--store", type=Path)
+
+    try:
+        known = store.parse_known_args()[0]
+    except ArgumentError:  # e.g. combined short options like -Sv
+        storing = False
+    else:
+        storing = known.store is not None and not known.send
     parser.add_argument("system", type=int, nargs="+", help="systems to upgrade")
     send_receive = parser.add_mutually_exclusive_group(required=True)
     send_receive.add_argument(
-        "-S", "--send", action="store_true", help="send a file to the system(s)"
+        "-S", "--send", action="store_true", help="send files to the system(s)"
     )
     send_receive.add_argument(
         "-R",
         "--retrieve",
         action="store_true",
-        help="retrieve a file from the system(s)",
+        help="retrieve files from the system(s)",
     )
     parser.add_argument("src", type=Path, help="the source file")
-    parser.add_argument("dst", type=Path, help="the destination file")
+    parser.add_argument(
+        "dst",
+        type=Path,
+        nargs="?" if storing else None,
+        help="the destination file (not needed with --store)",
+    )
+    parser.add_argument(
+        "-a",
+        "--add",
+        type=Path,
+        action="append",
+        default=[],
+        metavar="file",
+        help="add a source file to transfer in the same batch",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        type=Path,
+        action="append",
+        default=[],
+        metavar="file",
+        help="add the source files listed in the given file",
+    )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        metavar="dir",
+        help="retrieve files into a content-addressed store in the given directory",
+    )
+    parser.add_argument(
+        "-c", "--checksum", action="store_true", help="skip files based on checksums"
+    )
+    parser.add_argument(
+        "-z", "--compress", action="store_true", help="compress data during transfer"
+    )
+    parser.add_argument(
+        "--compress-level",
+        type=int,
+        metavar="n",
+        help="compress data with the given level during transfer",
+    )
+    parser.add_argument(
+        "--partial",
+        action="store_true",
+        help="keep partially transferred files to resume interrupted transfers",
+    )
+    parser.add_argument(
+        "--inplace", action="store_true", help="update destination files in-place"
+    )
+    parser.add_argument(
+        "--bwlimit",
+        type=int,
+        metavar="KiB/s",
+        help="limit the bandwidth of each transfer",
+    )
+    parser.add_argument(
+        "--total-bwlimit",
+        type=int,
+        metavar="KiB/s",
+        help="limit the bandwidth of all concurrent transfers in total",
+    )
     parser.add_argument(
         "-d", "--debug", action="store_true", help="enable debug logging"
     )
+    parser.add_argument(
+        "--capture-limit",
+        type=int,
+        metavar="bytes",
+        default=64 * 1024,
+        help="bytes of each command's stdout and stderr to keep in the results",
+    )
+    parser.add_argument(
+        "--log-dir",
+        type=Path,
+        metavar="dir",
+        help="write the full output of each step to <dir>/<system>/<step>.std{out,err}",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="print the output of the systems line by line while it arrives",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="do not start further systems after the first one failed",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        metavar="file",
+        help="write step timings and run metrics as a Prometheus textfile",
+    )
+    parser.add_argument(
+        "--openmetrics",
+        action="store_true",
+        help="write the metrics in the OpenMetrics format",
+    )
+    parser.add_argument(
+        "--summary",
+        action="store_true",
+        help="print step latencies, slowest systems and throughput when done",
+    )
+    parser.add_argument(
+        "-M",
+        "--multiplex",
+        action="store_true",
+        help="reuse one SSH connection per system for all steps",
+    )
+    parser.add_argument(
+        "-P",
+        "--probe",
+        action="store_true",
+        help="skip systems that do not accept SSH connections up front",
+    )
+    parser.add_argument(
+        "--probe-timeout",
+        type=float,
+        metavar="seconds",
+        default=3,
+        help="seconds to wait for the SSH port to accept connections",
+    )
     parser.add_argument(
         "-p",
         "--processes",
         type=int,
         metavar="n",
-        default=cpu_count(),
-        help="amount of parallel processes",
+        default=64,
+        help="amount of systems to process concurrently",
+    )
+    parser.add_argument(
+        "-l",
+        "--step-limit",
+        type=step_limit,
+        action="append",
+        default=[],
+        metavar="step=n",
+        help="limit the concurrency of a step, 0 meaning unlimited",
+    )
+    parser.add_argument(
+        "--retry",
+        type=retry_policy,
+        action="append",
+        default=[],
+        metavar="error=n[:seconds]",
+        help="retry steps failing with the given error class (connect, ssh, timeout,"
+        " dblock, other) up to n times, backing off from the given delay",
+    )
+    parser.add_argument(
+        "--retry-step",
+        action="append",
+        choices=("hash", "rsync"),
+        default=[],
+        metavar="step",
+        help="also retry the given step on errors after which it may have run"
+        " partially, e.g. execute or rsync",
+    )
+    parser.add_argument(
+        "--fixed-limits",
+        action="store_true",
+        help="do not adapt step limits to step durations and failures",
     )
     parser.add_argument(
         "-q",
         "--chunk-size",
         type=int,
         metavar="n",
-        help="chunk size for multiprocessing",
+        help="ignored, kept for backwards compatibility",
+    )
+    parser.add_argument(
+        "--relay",
+        type=seeds,
+        metavar="n",
+        help="send to n systems directly and let systems relay the file to others"
+        " (dst must be the full file path)",
     )
     parser.add_argument("-s", "--shuffle", action="store_true", help="shuffle systems")
     parser.add_argument("-u", "--user", metavar="name", help="set the ssh user name")
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="enable verbose logging"
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    if args.store is not None and not args.retrieve:
+        parser.error("--store requires -R/--retrieve")
+
+    return args
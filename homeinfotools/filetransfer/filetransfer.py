@@ -2,54 +2,169 @@
 
 from argparse import Namespace
 from pathlib import Path
+from typing import Iterable
 
 from homeinfotools.exceptions import SSHConnectionError
 from homeinfotools.logging import syslogger
-from homeinfotools.functions import completed_process_to_json, execute
-from homeinfotools.ssh import rsync
+from homeinfotools.functions import completed_process_to_json, execute_step
+from homeinfotools.ssh import relay, rsync
 
 
-__all__ = ["filetransfer"]
+__all__ = ["filetransfer", "get_sources"]
 
 
-def send(system: int, src: Path, dst: Path, *, user: str | None = None) -> list[str]:
-    """Sends a file to the system."""
+def get_sources(args: Namespace) -> list[Path]:
+    """Returns the source files from the arguments and manifest files.
 
-    return rsync(src, (system, dst), user=user)
+    Raises OSError if a manifest file cannot be read.
+    """
+
+    sources = [args.src, *args.add]
+
+    for manifest in args.manifest:
+        with manifest.open("r") as file:
+            for line in file:
+                if (line := line.strip()) and not line.startswith("#"):
+                    sources.append(Path(line))
+
+    return sources
+
+
+def get_options(args: Namespace) -> list[str]:
+    """Returns additional rsync options."""
+
+    options = []
+
+    if args.compress_level is not None:
+        options.append(f"--compress-level={args.compress_level}")
+    elif args.compress:
+        options.append("-z")
+
+    if args.checksum:
+        options.append("--checksum")
+
+    if args.partial:
+        options.append("--partial")
+
+    if args.inplace:
+        options.append("--inplace")
+
+    bwlimits = [] if args.bwlimit is None else [args.bwlimit]
+
+    if args.total_bwlimit is not None:
+        transfers = max(1, min(args.processes, len(args.system)))
+        bwlimits.append(max(1, args.total_bwlimit // transfers))
+
+    if bwlimits:
+        options.append(f"--bwlimit={min(bwlimits)}")
+
+    return options
+
+
+def send(
+    system: int,
+    sources: list[Path],
+    dst: Path,
+    *,
+    user: str | None = None,
+    control_path: Path | None = None,
+    options: Iterable[str] = (),
+) -> list[str]:
+    """Sends files to the system."""
+
+    return rsync(
+        sources,
+        (system, dst),
+        user=user,
+        control_path=control_path,
+        options=options,
+    )
 
 
 def retrieve(
-    system: int, src: Path, dst: Path, *, user: str | None = None
+    system: int,
+    sources: list[Path],
+    dst: Path,
+    *,
+    user: str | None = None,
+    control_path: Path | None = None,
+    options: Iterable[str] = (),
 ) -> list[str]:
-    """Retrieves a file from the system."""
+    """Retrieves files from the system.
+
+    A single file is stored as <dst>.<system><suffix>,
+    multiple files are stored in the directory <dst>.<system>.
+    """
+
+    if len(sources) == 1:
+        dst = dst.parent / (dst.stem + f".{system}" + dst.suffix)
+    else:
+        dst = f"{dst.parent / (dst.name + f'.{system}')}/"
+
+    return rsync(
+        [(system, src) for src in sources],
+        dst,
+        user=user,
+        control_path=control_path,
+        options=options,
+    )
+
 
-    dst = dst.parent / (dst.stem + f".{system}" + dst.suffix)
-    return rsync((system, src), dst, user=user)
+async def filetransfer(
+    system: int, args: Namespace, *, source: int | None = None
+) -> dict:
+    """Runs commands on a remote system.
 
+    If a source system is given, the file is sent from its copy on
+    that system instead of from the local host.
+    """
 
-def filetransfer(system: int, args: Namespace) -> dict:
-    """Runs commands on a remote system."""
+    sources = args.sources
 
     if args.retrieve:
-        command = retrieve(system, args.src, args.dst, user=args.user)
+        command = retrieve(
+            system,
+            sources,
+            args.dst,
+            user=args.user,
+            control_path=args.control_path,
+            options=get_options(args),
+        )
+    elif args.send and source is not None:
+        command = relay(
+            source,
+            system,
+            args.dst if len(sources) == 1 else f"{args.dst}/",
+            user=args.user,
+            control_path=args.control_path,
+            options=get_options(args),
+        )
     elif args.send:
-        command = send(system, args.src, args.dst, user=args.user)
+        command = send(
+            system,
+            sources,
+            args.dst,
+            user=args.user,
+            control_path=args.control_path,
+            options=get_options(args),
+        )
     else:
         raise ValueError("No direction selected.")
 
-    syslogger(system).debug('Sending "%s" to system.', args.src)
-    completed_process = execute(command)
+    syslogger(system).debug("Transferring %s.", ", ".join(map(str, sources)))
+    completed_process = await execute_step("rsync", command, args, system=system)
 
     if completed_process.returncode == 255:
         raise SSHConnectionError(completed_process)
 
     syslogger(system).debug("Returncode: %i", completed_process.returncode)
 
-    if stdout := completed_process.stdout:
-        syslogger(system).info(stdout.strip())
+    if not args.stream:
+        if stdout := completed_process.stdout:
+            syslogger(system).info(stdout.strip())
 
-    if stderr := completed_process.stderr:
-        syslogger(system).warning(stderr.strip())
+        if stderr := completed_process.stderr:
+            syslogger(system).warning(stderr.strip())
 
     if not completed_process.returncode == 0:
         syslogger(system).error("File transfer failed.")
@@ -1,13 +1,22 @@
 """Batch sync files."""
 
 from logging import basicConfig
-from multiprocessing import Manager, Pool
 from random import shuffle
 
 from homeinfotools.functions import get_log_level
-from homeinfotools.logging import LOG_FORMAT
+from homeinfotools.limiter import get_limiters
+from homeinfotools.logging import LOG_FORMAT, LOGGER
+from homeinfotools.metrics import get_run_metrics, report
 from homeinfotools.filetransfer.argparse import get_args
+from homeinfotools.filetransfer.filetransfer import get_sources
+from homeinfotools.filetransfer.relay import distribute
+from homeinfotools.filetransfer.store import ContentStore
 from homeinfotools.filetransfer.worker import Worker
+from homeinfotools.pool import process
+from homeinfotools.probe import probe
+from homeinfotools.retry import SAFE_STEPS, get_retry_policies
+from homeinfotools.results import ResultsWriter, failed
+from homeinfotools.ssh import multiplexing
 
 
 __all__ = ["main"]
@@ -19,15 +28,52 @@ def main() -> int:
     args = get_args()
     basicConfig(format=LOG_FORMAT, level=get_log_level(args))
 
+    try:
+        args.sources = get_sources(args)
+    except OSError as error:
+        LOGGER.error("Could not read manifest: %s", error)
+        return 2
+
     if args.shuffle:
         shuffle(args.system)
 
-    results = Manager().dict()
+    args.limiters = get_limiters(args.step_limit, adaptive=not args.fixed_limits)
+    args.retry_policies = get_retry_policies(args.retry)
+    args.retry_steps = SAFE_STEPS.union(args.retry_step)
+    args.slots = None
+    args.run_metrics = get_run_metrics(args, "sysrsync")
+
+    if args.retrieve and args.store is not None:
+        args.content_store = ContentStore(args.store)
+
+    worker = Worker(args, ResultsWriter())
 
     try:
-        with Pool(args.processes) as pool:
-            pool.map(Worker(args, results), args.system, chunksize=args.chunk_size)
+        if args.probe:
+            args.system, offline = probe(args.system, timeout=args.probe_timeout)
+
+            for system in offline:
+                worker.skip_offline(system)
+
+        with multiplexing(args):
+            if args.send and args.relay:
+                distribute(
+                    worker,
+                    args.system,
+                    seeds=args.relay,
+                    concurrency=args.processes,
+                    until=failed if args.fail_fast else None,
+                )
+            else:
+                process(
+                    worker,
+                    args.system,
+                    concurrency=args.processes,
+                    until=failed if args.fail_fast else None,
+                )
     except KeyboardInterrupt:
         return 1
+    finally:
+        report(args)
 
     return 0
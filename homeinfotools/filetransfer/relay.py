@@ -0,0 +1,108 @@
+"""Distribution of files along a relay tree.
+
+The local host sends the file to a limited amount of systems. Every system
+that has received the file subsequently relays it to another system, so
+that the amount of senders doubles in each round.
+"""
+
+from argparse import ArgumentTypeError
+from asyncio import Queue, Semaphore, create_task, gather, run
+from collections import deque
+from typing import Any, Callable, Iterable
+
+from homeinfotools.filetransfer.worker import Worker
+from homeinfotools.logging import LOGGER, syslogger
+from homeinfotools.results import DONE
+
+
+__all__ = ["distribute", "seeds"]
+
+
+def seeds(string: str) -> int:
+    """Parses the amount of systems to send to directly."""
+
+    try:
+        value = int(string)
+    except ValueError:
+        raise ArgumentTypeError(f"Invalid amount of systems: {string}") from None
+
+    if value < 1:
+        raise ArgumentTypeError(f"At least one system is required: {string}")
+
+    return value
+
+
+async def relay_systems(
+    worker: Worker,
+    systems: Iterable[int],
+    *,
+    seeds: int,
+    concurrency: int,
+    until: Callable[[Any], bool] | None = None,
+) -> None:
+    """Sends the file to the systems along a relay tree.
+
+    If the <until> predicate matches a result, no further systems are
+    started, while running transfers are completed.
+    """
+
+    pending = deque(systems)
+    senders = Queue()
+    slots = Semaphore(concurrency)
+    transfers = set()
+
+    for _ in range(seeds):
+        senders.put_nowait(None)
+
+    async def transfer(source: int | None, target: int) -> None:
+        relayed = True
+
+        try:
+            result = await worker(target, source=source)
+            # The worker falls back to sending directly if the relay failed.
+            relayed = "relay" not in result.get("result", {})
+        finally:
+            slots.release()
+
+            # A source that failed to relay to a reachable target is dropped.
+            if relayed or result["status"] != DONE:
+                senders.put_nowait(source)
+            else:
+                syslogger(source).warning("Not relaying from this system any more.")
+
+        if result["status"] == DONE:
+            senders.put_nowait(target)
+        elif until is not None and until(result) and pending:
+            LOGGER.error("Stopping. Skipping %i pending systems.", len(pending))
+            pending.clear()
+
+    while pending:
+        source = await senders.get()
+        await slots.acquire()
+
+        if not pending:
+            slots.release()
+            break
+
+        task = create_task(transfer(source, pending.popleft()))
+        transfers.add(task)
+        task.add_done_callback(transfers.discard)
+
+    await gather(*transfers)
+
+
+def distribute(
+    worker: Worker,
+    systems: Iterable[int],
+    *,
+    seeds: int,
+    concurrency: int,
+    until: Callable[[Any], bool] | None = None,
+) -> None:
+    """Runs the event loop to distribute the file."""
+
+    run(
+        relay_systems(
+            worker, systems, seeds=seeds, concurrency=concurrency, until=until
+        )
+    )
@@ -0,0 +1,186 @@
+"""Content-addressed storage of retrieved files.
+
+Retrieved files are stored once per content under objects/<hh>/<hash>.
+The index/<system>.json files map the paths on each system to hashes.
+Files whose remote hash is already present in the store are not transferred.
+"""
+
+from argparse import Namespace
+from asyncio import Future, get_running_loop
+from hashlib import sha256
+from json import dump
+from pathlib import Path
+from shlex import quote
+from tempfile import NamedTemporaryFile
+
+from homeinfotools.exceptions import SSHConnectionError
+from homeinfotools.functions import completed_process_to_json, execute_step
+from homeinfotools.logging import syslogger
+from homeinfotools.ssh import rsync, ssh
+
+
+__all__ = ["ContentStore", "retrieve_to_store"]
+
+
+SHA256SUM = "/usr/bin/sha256sum"
+CHUNK_SIZE = 1024 * 1024
+
+
+class ContentStore:
+    """A content-addressed file store."""
+
+    __slots__ = ("root", "pending")
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.pending: dict[str, Future] = {}
+        root.joinpath("objects").mkdir(parents=True, exist_ok=True)
+        root.joinpath("index").mkdir(exist_ok=True)
+
+    def object(self, digest: str) -> Path:
+        """Returns the path of the object with the given hash."""
+        return self.root / "objects" / digest[:2] / digest
+
+    def write_index(self, system: int, files: dict[str, str | None]) -> None:
+        """Writes the index of the given system."""
+        with NamedTemporaryFile(
+            "w", dir=self.root / "index", suffix=".tmp", delete=False
+        ) as file:
+            dump(files, file, indent=2)
+
+        Path(file.name).replace(self.root / "index" / f"{system}.json")
+
+    async def fetch(
+        self, system: int, src: str, digest: str, args: Namespace
+    ) -> dict | None:
+        """Retrieves the file into the store unless its content is already
+        present or being retrieved from another system.
+
+        Returns the rsync result if the file was transferred.
+        """
+        while (pending := self.pending.get(digest)) is not None:
+            if await pending:
+                return None
+
+        if self.object(digest).exists():
+            return None
+
+        self.pending[digest] = future = get_running_loop().create_future()
+
+        try:
+            result = await self.transfer(system, src, digest, args)
+        except BaseException:
+            future.set_result(False)
+            raise
+        finally:
+            del self.pending[digest]
+
+        future.set_result(result["returncode"] == 0)
+        return result
+
+    async def transfer(
+        self, system: int, src: str, digest: str, args: Namespace
+    ) -> dict:
+        """Transfers the file into the store and verifies its hash."""
+        (target := self.object(digest)).parent.mkdir(exist_ok=True)
+        tmp = target.with_suffix(".part")
+        command = rsync(
+            (system, src),
+            tmp,
+            update=False,
+            user=args.user,
+            control_path=args.control_path,
+            options=["--checksum"],
+        )
+        completed_process = await execute_step("rsync", command, args, system=system)
+
+        if completed_process.returncode == 255:
+            raise SSHConnectionError(completed_process)
+
+        result = completed_process_to_json(completed_process)
+
+        if completed_process.returncode != 0:
+            syslogger(system).error("Could not retrieve %s.", src)
+            return result
+
+        if hash_file(tmp) != digest:
+            syslogger(system).error("Hash mismatch of %s.", src)
+            tmp.unlink()
+            return {**result, "returncode": None, "error": "hash mismatch"}
+
+        tmp.replace(target)
+        return result
+
+
+def hash_file(path: Path) -> str:
+    """Returns the SHA-256 hash of the given file."""
+
+    digest = sha256()
+
+    with path.open("rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+async def hash_remote(
+    system: int, sources: list[str], args: Namespace
+) -> dict[str, str | None]:
+    """Returns the SHA-256 hashes of the files on the system.
+
+    Files that could not be hashed are mapped to None.
+    """
+
+    command = ssh(
+        system,
+        SHA256SUM,
+        "--",
+        *map(quote, sources),
+        user=args.user,
+        control_path=args.control_path,
+    )
+    completed_process = await execute_step(
+        "hash", command, args, system=system, success={0, 1}, bounded=False
+    )
+
+    if completed_process.returncode == 255:
+        raise SSHConnectionError(completed_process)
+
+    hashes = dict.fromkeys(sources)
+
+    for line in completed_process.stdout.splitlines():
+        digest, _, path = line.partition("  ")
+
+        if path in hashes:
+            hashes[path] = digest
+
+    return hashes
+
+
+async def retrieve_to_store(system: int, args: Namespace) -> dict:
+    """Retrieves the source files of the system into the content store."""
+
+    store = args.content_store
+    hashes = await hash_remote(system, list(map(str, args.sources)), args)
+    transfers = {}
+
+    for src, digest in hashes.items():
+        if digest is None:
+            syslogger(system).warning("Could not hash %s.", src)
+            continue
+
+        if (result := await store.fetch(system, src, digest, args)) is not None:
+            transfers[src] = result
+
+        # Only index files whose content actually is in the store.
+        if not store.object(digest).exists():
+            hashes[src] = None
+
+    store.write_index(system, hashes)
+    syslogger(system).info(
+        "Stored %i files, %i transferred.",
+        sum(digest is not None for digest in hashes.values()),
+        sum(result["returncode"] == 0 for result in transfers.values()),
+    )
+    return {"files": hashes, "transfers": transfers}
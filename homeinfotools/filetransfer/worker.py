@@ -1,6 +1,11 @@
 """Processing of systems."""
 
+from homeinfotools.exceptions import SSHConnectionError
 from homeinfotools.filetransfer.filetransfer import filetransfer
+from homeinfotools.filetransfer.store import retrieve_to_store
+from homeinfotools.functions import completed_process_to_json
+from homeinfotools.logging import syslogger
+from homeinfotools.results import DONE, FAILED, OFFLINE
 from homeinfotools.worker import BaseWorker
 
 
@@ -8,8 +13,50 @@ __all__ = ["Worker"]
 
 
 class Worker(BaseWorker):
-    """Stored args and manager to process systems."""
+    """Stored args and results to process systems."""
 
-    def run(self, system: int) -> dict:
-        """Runs the worker."""
-        return {"rsync": filetransfer(system, self.args)}
+    async def run(self, system: int, *, source: int | None = None) -> dict:
+        """Runs the worker.
+
+        If relaying from the source system fails, the file is sent
+        directly and the failed relay is recorded in the result.
+        """
+        if self.args.retrieve and self.args.store is not None:
+            return {"store": await retrieve_to_store(system, self.args)}
+
+        if source is None:
+            return {"rsync": await filetransfer(system, self.args)}
+
+        try:
+            relayed = await filetransfer(system, self.args, source=source)
+        except SSHConnectionError as error:
+            relayed = completed_process_to_json(error.completed_process)
+
+        if relayed["returncode"] == 0:
+            return {"rsync": relayed}
+
+        syslogger(system).warning(
+            "Relay from system %i failed. Sending directly.", source
+        )
+        return {
+            "rsync": await filetransfer(system, self.args),
+            "relay": {"source": source, **relayed},
+        }
+
+    def get_status(self, result: dict) -> str:
+        """Returns the journal status of a processed system."""
+        if not result["online"]:
+            return OFFLINE
+
+        if (store := result["result"].get("store")) is not None:
+            if None in store["files"].values():
+                return FAILED
+
+            if any(
+                transfer["returncode"] != 0 for transfer in store["transfers"].values()
+            ):
+                return FAILED
+
+            return DONE
+
+        return DONE if result["result"]["rsync"]["returncode"] == 0 else FAILED
@@ -1,17 +1,32 @@
 """Common functions."""
 
 from argparse import Namespace
+from asyncio import TimeoutError, create_subprocess_exec, gather, sleep, wait_for
+from contextlib import AsyncExitStack
 from functools import wraps
+from itertools import count
 from logging import DEBUG, INFO, WARNING
-from subprocess import DEVNULL, PIPE, run, CompletedProcess
-from typing import Callable, Iterable
-
-from homeinfotools.logging import LOGGER
+from pathlib import Path
+from subprocess import DEVNULL, PIPE, CompletedProcess, TimeoutExpired
+from time import monotonic
+from typing import Callable, Container, Sequence
+
+from homeinfotools.capture import BoundedOutput, CapturedProcess, capture, echoes
+from homeinfotools.logging import LOGGER, syslogger
+from homeinfotools.metrics import timed
+from homeinfotools.retry import (
+    SYSTEM_ERRORS,
+    classify,
+    get_step_policies,
+    retry_delay,
+)
 
 
 __all__ = [
     "completed_process_to_json",
     "execute",
+    "execute_step",
+    "get_log",
     "get_log_level",
     "handle_keyboard_interrupt",
 ]
@@ -20,28 +35,188 @@ __all__ = [
 def completed_process_to_json(completed_process: CompletedProcess) -> dict:
     """Converts a completed process into a JSON-ish dict."""
 
-    return {
+    json = {
         "args": completed_process.args,
         "returncode": completed_process.returncode,
         "stdout": completed_process.stdout,
         "stderr": completed_process.stderr,
     }
 
+    if isinstance(completed_process, CapturedProcess):
+        if completed_process.output:
+            json["output"] = completed_process.output
+
+        if completed_process.attempts:
+            json["attempts"] = completed_process.attempts
+
+    return json
+
 
-def execute(
-    command: str | Iterable[str], *, timeout: int | None = None
+async def execute(
+    command: Sequence[str],
+    *,
+    timeout: int | None = None,
+    limit: int | None = None,
+    log: Path | None = None,
+    prefix: str | None = None,
 ) -> CompletedProcess:
-    """Executes the given command."""
-
-    return run(
-        command,
-        stdin=DEVNULL,
-        stdout=PIPE,
-        stderr=PIPE,
-        text=True,
-        check=False,
-        timeout=timeout,
+    """Executes the given command asynchronously.
+
+    Only the first and last <limit> / 2 bytes of stdout and stderr are
+    kept in memory. If a log path is given, the full output is written
+    to <log>.stdout and <log>.stderr respectively. If a prefix is given,
+    the output is printed line by line with that prefix while it runs.
+    """
+
+    process = await create_subprocess_exec(
+        *command, stdin=DEVNULL, stdout=PIPE, stderr=PIPE
     )
+    stdout = BoundedOutput(limit, None if log is None else Path(f"{log}.stdout"))
+    stderr = BoundedOutput(limit, None if log is None else Path(f"{log}.stderr"))
+    echo = (None, None) if prefix is None else echoes(prefix)
+
+    try:
+        await wait_for(
+            gather(
+                capture(process.stdout, stdout, echo[0]),
+                capture(process.stderr, stderr, echo[1]),
+                process.wait(),
+            ),
+            timeout,
+        )
+    except TimeoutError:
+        process.kill()
+        await process.wait()
+        raise TimeoutExpired(command, timeout) from None
+
+    return CapturedProcess(command, process.returncode, stdout, stderr)
+
+
+async def execute_step(
+    step: str,
+    command: Sequence[str],
+    args: Namespace,
+    *,
+    system: int | None = None,
+    timeout: int | None = None,
+    success: Container[int] = frozenset({0}),
+    bounded: bool = True,
+    retry: bool = True,
+) -> CompletedProcess:
+    """Executes the command of the given step within the step's
+    concurrency limit and a shared step slot, if any, reporting
+    its outcome to the limiter and recording its timing span.
+
+    Unless the caller needs the complete output, it is bounded
+    and spilled to the log directory as configured.
+
+    Failed attempts are retried according to the retry policies,
+    unless disabled, and recorded in the completed process.
+    """
+
+    if bounded:
+        kwargs = {"limit": args.capture_limit, "log": get_log(step, args, system)}
+    else:
+        kwargs = {}
+
+    if args.stream and system is not None:
+        kwargs["prefix"] = f"[{system}]"
+
+    if retry:
+        policies = get_step_policies(args.retry_policies, step, args.retry_steps)
+    else:
+        policies = {}
+    attempts = []
+
+    for attempt in count(1):
+        try:
+            completed_process = await run_step(
+                step,
+                command,
+                args,
+                timeout=timeout,
+                success=success,
+                attempt=attempt,
+                **kwargs,
+            )
+        except TimeoutExpired:
+            if (delay := retry_delay(policies, error := "timeout", attempt)) is None:
+                raise
+        else:
+            if completed_process.returncode in success:
+                break
+
+            error = classify(completed_process)
+
+            if (delay := retry_delay(policies, error, attempt)) is None:
+                break
+
+        (LOGGER if system is None else syslogger(system)).warning(
+            "Step %s failed (%s). Retrying in %.1f seconds.", step, error, delay
+        )
+        attempts.append({"error": error, "delay": round(delay, 3)})
+        # Neither the step's limit nor a shared slot is held while waiting.
+        await sleep(delay)
+
+    completed_process.attempts = attempts
+    return completed_process
+
+
+async def run_step(
+    step: str,
+    command: Sequence[str],
+    args: Namespace,
+    *,
+    timeout: int | None,
+    success: Container[int],
+    attempt: int,
+    **kwargs,
+) -> CompletedProcess:
+    """Runs a single attempt of a step."""
+
+    queued = monotonic()
+
+    async with AsyncExitStack() as stack:
+        # Acquire the step's limit first, so that no shared slot is
+        # held while waiting for it.
+        if (limiter := args.limiters.get(step)) is not None:
+            await stack.enter_async_context(limiter)
+
+        if args.slots is not None:
+            await stack.enter_async_context(args.slots(step))
+
+        start = monotonic()
+
+        try:
+            with timed(step, wait=start - queued, attempt=attempt):
+                completed_process = await execute(command, timeout=timeout, **kwargs)
+        except TimeoutExpired:
+            if limiter is not None:
+                limiter.feedback(monotonic() - start, timed_out=True)
+
+            raise
+
+        if limiter is not None:
+            if completed_process.returncode in success:
+                limiter.feedback(monotonic() - start)
+            # Failures of individual systems, e.g. being offline, do not
+            # indicate congestion, but failures of the step itself may.
+            elif classify(completed_process) not in SYSTEM_ERRORS:
+                limiter.feedback(monotonic() - start, failed=True)
+
+        return completed_process
+
+
+def get_log(step: str, args: Namespace, system: int | None = None) -> Path | None:
+    """Returns the log path prefix of the step's output."""
+
+    if args.log_dir is None:
+        return None
+
+    if system is None:
+        return args.log_dir / step
+
+    return args.log_dir / str(system) / step
 
 
 def get_log_level(args: Namespace) -> int:
@@ -1,31 +1,53 @@
 """HIS SSO API."""
 
+from json import dump, load
+from os import O_CREAT, O_TRUNC, O_WRONLY, open as os_open
+from pathlib import Path
+from time import time
 from typing import Any
 
-from requests import session
+from requests import Response, session
 
 from homeinfotools.his.exceptions import DownloadError, LoginError
+from homeinfotools.his.functions import update_credentials
+from homeinfotools.logging import LOGGER
+from homeinfotools.os import CACHE_DIR
 
 
 __all__ = ["HISSession"]
 
 
 URL = "https://his.homeinfo.de/session"
+SESSION_CACHE = CACHE_DIR / "his.session"
 
 
 class HISSession:
     """A HIS session."""
 
-    def __init__(self, account: str, passwd: str):
-        """Sets account name and password."""
+    def __init__(
+        self,
+        account: str | None,
+        passwd: str | None = None,
+        *,
+        cache_file: Path | None = SESSION_CACHE,
+    ):
+        """Sets account name, password and session cache file.
+
+        Missing credentials are queried when a login is required.
+        """
         self.account = account
         self.passwd = passwd
+        self.cache_file = cache_file
         self.session = session()
         self.session_guard = None
+        self.logged_in = False
 
     def __enter__(self):
         self.session_guard = self.session.__enter__()
-        self.login()
+
+        if not self.load_cookies():
+            self.login()
+
         return self
 
     def __exit__(self, *args):
@@ -43,14 +65,113 @@ class HISSession:
 
     def login(self) -> bool:
         """Performs a login."""
+        self.account, self.passwd = update_credentials(self.account, self.passwd)
+
         if (response := self.post(URL, json=self.json)).status_code != 200:
             raise LoginError(response)
 
+        self.logged_in = True
+        self.save_cookies()
         return True
 
+    def load_cookies(self) -> bool:
+        """Loads unexpired session cookies from the cache file,
+        unless they belong to another account.
+        """
+        if self.cache_file is None:
+            return False
+
+        try:
+            with self.cache_file.open("r") as file:
+                cache = load(file)
+        except (FileNotFoundError, ValueError):
+            return False
+
+        if not isinstance(cache, dict) or not cache.get("account"):
+            return False
+
+        if self.account is not None and cache["account"] != self.account:
+            LOGGER.debug("Cached session belongs to another account.")
+            return False
+
+        now = time()
+        cookies = [
+            cookie
+            for cookie in cache.get("cookies", [])
+            if cookie.get("expires") is None or cookie["expires"] > now
+        ]
+
+        if cookies:
+            self.account = cache["account"]
+
+        for cookie in cookies:
+            self.session.cookies.set(**cookie)
+
+        LOGGER.debug("Loaded %i cached session cookies.", len(cookies))
+        return bool(cookies)
+
+    def save_cookies(self) -> None:
+        """Stores the session cookies along with the account
+        in the cache file, which is readable by the current user only.
+        """
+        if self.cache_file is None:
+            return
+
+        cookies = [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "expires": cookie.expires,
+            }
+            for cookie in self.session.cookies
+        ]
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(
+            os_open(self.cache_file, O_WRONLY | O_CREAT | O_TRUNC, 0o600), "w"
+        ) as file:
+            dump({"account": self.account, "cookies": cookies}, file)
+
+        self.cache_file.chmod(0o600)
+
+    def get(self, url: str, **kwargs) -> Response:
+        """Performs a GET request, logging in again
+        if a cached session has been rejected.
+        """
+        response = self.session_guard.get(url, **kwargs)
+
+        if response.status_code in {401, 403} and not self.logged_in:
+            LOGGER.debug("Cached session was rejected. Logging in.")
+            self.login()
+            response = self.session_guard.get(url, **kwargs)
+
+        return response
+
     def get_json(self, url: str) -> dict | list:
         """Returns a JSON-ish dict."""
         if (response := self.get(url)).status_code != 200:
             raise DownloadError(response)
 
         return response.json()
+
+    def get_modified(
+        self, url: str, *, etag: str | None = None, last_modified: str | None = None
+    ) -> Response | None:
+        """Returns the response unless the resource has not been modified."""
+        headers = {}
+
+        if etag is not None:
+            headers["If-None-Match"] = etag
+
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+
+        if (response := self.get(url, headers=headers)).status_code == 304:
+            return None
+
+        if response.status_code != 200:
+            raise DownloadError(response)
+
+        return response
@@ -0,0 +1,212 @@
+"""Adaptive per-step concurrency limits."""
+
+from argparse import ArgumentTypeError
+from asyncio import CancelledError, Condition, Future, get_running_loop
+from collections import deque
+from contextlib import asynccontextmanager
+from heapq import heappop, heappush
+from itertools import count
+from time import monotonic
+from typing import AsyncIterator, Sequence
+
+from homeinfotools.logging import LOGGER
+
+
+__all__ = [
+    "DEFAULT_LIMITS",
+    "AdaptiveLimiter",
+    "StepSlots",
+    "get_limiters",
+    "step_limit",
+]
+
+
+DEFAULT_LIMITS = {"keyring": 30, "sysupgrade": 30}
+DECREASE = 0.5
+FAILURE_RATE = 0.5
+FAILURE_WINDOW = 20
+SMOOTHING = 0.2
+
+
+class AdaptiveLimiter:
+    """Limits the concurrency of a step.
+
+    The limit is adapted AIMD-style: it grows by one per window of
+    successful runs and is halved if a run times out, takes significantly
+    longer than the moving average of previous successful runs or if more
+    than half of the recent runs failed.
+    """
+
+    __slots__ = (
+        "name",
+        "maximum",
+        "minimum",
+        "tolerance",
+        "cooldown",
+        "adaptive",
+        "window",
+        "active",
+        "average",
+        "outcomes",
+        "decreased",
+        "condition",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        maximum: int,
+        *,
+        minimum: int = 1,
+        tolerance: float = 3.0,
+        cooldown: float = 10.0,
+        adaptive: bool = True,
+    ):
+        self.name = name
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.tolerance = tolerance
+        self.cooldown = cooldown
+        self.adaptive = adaptive
+        self.window = float(maximum)
+        self.active = 0
+        self.average = None
+        self.outcomes = deque(maxlen=FAILURE_WINDOW)
+        self.decreased = float("-inf")
+        self.condition = Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+        return self
+
+    async def __aexit__(self, *_):
+        async with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    @property
+    def limit(self) -> int:
+        """Returns the current limit."""
+        return max(self.minimum, int(self.window))
+
+    @property
+    def failing(self) -> bool:
+        """Returns whether too many of the recent runs failed."""
+        return (
+            len(self.outcomes) == FAILURE_WINDOW
+            and sum(self.outcomes) > FAILURE_RATE * FAILURE_WINDOW
+        )
+
+    def feedback(
+        self, duration: float, *, timed_out: bool = False, failed: bool = False
+    ) -> None:
+        """Adapts the limit to the duration of a successful
+        or timed out run or to the rate of failed runs.
+        """
+        if not self.adaptive:
+            return
+
+        if failed:
+            self.outcomes.append(True)
+
+            if not self.failing:
+                return
+        elif not timed_out:
+            self.outcomes.append(False)
+            congested = (
+                self.average is not None and duration > self.tolerance * self.average
+            )
+            self.average = (
+                duration
+                if self.average is None
+                else self.average + SMOOTHING * (duration - self.average)
+            )
+
+            if not congested:
+                self.window = min(self.maximum, self.window + 1 / self.window)
+                return
+
+        if (now := monotonic()) - self.decreased < self.cooldown:
+            return
+
+        self.decreased = now
+        self.outcomes.clear()
+        self.window = max(self.minimum, self.window * DECREASE)
+        LOGGER.debug("Reduced concurrency of %s to %i.", self.name, self.limit)
+
+
+class StepSlots:
+    """Limits the amount of steps running concurrently across all systems.
+
+    A freed slot goes to the waiting step that is furthest along the step
+    order, so that systems which have been started are finished first,
+    and to the longest waiting one among equal steps.
+    """
+
+    __slots__ = ("available", "order", "waiters", "counter")
+
+    def __init__(self, slots: int, order: Sequence[str]):
+        self.available = slots
+        self.order = {step: index for index, step in enumerate(order)}
+        self.waiters: list[tuple[int, int, Future]] = []
+        self.counter = count()
+
+    @asynccontextmanager
+    async def __call__(self, step: str) -> AsyncIterator[None]:
+        """Occupies a slot for the given step."""
+        if self.available > 0 and not self.waiters:
+            self.available -= 1
+        else:
+            future = get_running_loop().create_future()
+            priority = -self.order.get(step, -1)
+            heappush(self.waiters, (priority, next(self.counter), future))
+
+            try:
+                await future
+            except CancelledError:
+                # The slot may have been handed over right before the cancellation.
+                if future.done() and not future.cancelled():
+                    self.release()
+
+                raise
+
+        try:
+            yield
+        finally:
+            self.release()
+
+    def release(self) -> None:
+        """Hands the slot over to the next waiting step or frees it."""
+        while self.waiters:
+            *_, future = heappop(self.waiters)
+
+            if not future.done():
+                future.set_result(None)
+                return
+
+        self.available += 1
+
+
+def step_limit(string: str) -> tuple[str, int]:
+    """Parses a step limit like "sysupgrade=30"."""
+
+    try:
+        step, limit = string.split("=")
+        return step, int(limit)
+    except ValueError:
+        raise ArgumentTypeError(f"Invalid step limit: {string}") from None
+
+
+def get_limiters(
+    limits: list[tuple[str, int]], *, adaptive: bool = True
+) -> dict[str, AdaptiveLimiter]:
+    """Returns limiters for the default and given step limits."""
+
+    return {
+        step: AdaptiveLimiter(step, limit, adaptive=adaptive)
+        for step, limit in {**DEFAULT_LIMITS, **dict(limits)}.items()
+        if limit > 0
+    }
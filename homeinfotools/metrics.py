@@ -0,0 +1,229 @@
+"""Timing of remote steps and run metrics."""
+
+from argparse import Namespace
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from math import ceil
+from os import replace
+from pathlib import Path
+from sys import stderr
+from time import monotonic, time
+from typing import Iterable, Iterator
+
+
+__all__ = ["RunMetrics", "get_run_metrics", "report", "spans", "timed"]
+
+
+QUANTILES = (0.5, 0.9, 0.99)
+SPANS: ContextVar[list[dict] | None] = ContextVar("spans", default=None)
+
+
+@contextmanager
+def spans() -> Iterator[list[dict]]:
+    """Collects the timing spans of the steps run in this context."""
+
+    token = SPANS.set(collected := [])
+
+    try:
+        yield collected
+    finally:
+        SPANS.reset(token)
+
+
+@contextmanager
+def timed(step: str, *, wait: float = 0, attempt: int = 1) -> Iterator[None]:
+    """Records a timing span of the given step, if spans are being collected."""
+
+    if (collected := SPANS.get()) is None:
+        yield
+        return
+
+    start = datetime.now()
+    begin = monotonic()
+
+    try:
+        yield
+    finally:
+        span = {
+            "step": step,
+            "start": start.isoformat(),
+            "duration": round(monotonic() - begin, 3),
+        }
+
+        if wait := round(wait, 3):
+            span["wait"] = wait
+
+        if attempt > 1:
+            span["attempt"] = attempt
+
+        collected.append(span)
+
+
+def quantile(values: list[float], q: float) -> float:
+    """Returns the nearest-rank quantile of the sorted values."""
+
+    return values[max(0, ceil(q * len(values)) - 1)]
+
+
+class RunMetrics:
+    """Collects the timings of all processed systems of a run."""
+
+    __slots__ = ("tool", "start", "systems")
+
+    def __init__(self, tool: str):
+        """Sets the name of the tool and starts the run clock."""
+        self.tool = tool
+        self.start = monotonic()
+        self.systems: dict[int, dict] = {}
+
+    def add(self, system: int, duration: float, result: dict) -> None:
+        """Adds the result of a processed system."""
+        self.systems[system] = {
+            "duration": duration,
+            "status": result["status"],
+            "timings": result.get("timings", ()),
+        }
+
+    @property
+    def elapsed(self) -> float:
+        """Returns the seconds since the start of the run."""
+        return monotonic() - self.start
+
+    @property
+    def throughput(self) -> float:
+        """Returns the processed systems per minute."""
+        return len(self.systems) / max(self.elapsed, 1e-9) * 60
+
+    def steps(self) -> dict[str, list[float]]:
+        """Returns the sorted durations of each step."""
+        steps: dict[str, list[float]] = {}
+
+        for system in self.systems.values():
+            for span in system["timings"]:
+                steps.setdefault(span["step"], []).append(span["duration"])
+
+        return {step: sorted(durations) for step, durations in steps.items()}
+
+    def statuses(self) -> dict[str, int]:
+        """Returns the amount of systems per status."""
+        statuses: dict[str, int] = {}
+
+        for system in self.systems.values():
+            statuses[system["status"]] = statuses.get(system["status"], 0) + 1
+
+        return statuses
+
+    def slowest(self, n: int = 5) -> list[tuple[int, float]]:
+        """Returns the n systems that took longest."""
+        return sorted(
+            ((system, item["duration"]) for system, item in self.systems.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )[:n]
+
+    def summary(self) -> str:
+        """Returns a human-readable summary of the run."""
+        lines = [
+            f"Processed {len(self.systems)} systems in {self.elapsed:.1f} s"
+            f" ({self.throughput:.1f} systems/min).",
+            "Status: "
+            + ", ".join(f"{s}: {n}" for s, n in sorted(self.statuses().items())),
+        ]
+
+        if steps := self.steps():
+            lines.append(
+                f"{'step':<12} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}"
+            )
+
+        for step, durations in sorted(steps.items()):
+            lines.append(
+                f"{step:<12} {len(durations):>6} "
+                + " ".join(f"{quantile(durations, q):>8.2f}" for q in QUANTILES)
+                + f" {durations[-1]:>8.2f}"
+            )
+
+        if slowest := self.slowest():
+            lines.append(
+                "Slowest: "
+                + ", ".join(f"{system} ({secs:.1f} s)" for system, secs in slowest)
+            )
+
+        return "\n".join(lines)
+
+    def exposition(self, *, openmetrics: bool = False) -> str:
+        """Returns the metrics in the Prometheus or OpenMetrics text format."""
+        return "".join(self._exposition(openmetrics=openmetrics))
+
+    def _exposition(self, *, openmetrics: bool) -> Iterable[str]:
+        """Yields the lines of the text format."""
+        prefix = "homeinfotools"
+        tool = f'tool="{self.tool}"'
+
+        yield f"# HELP {prefix}_step_duration_seconds Duration of remote steps.\n"
+        yield f"# TYPE {prefix}_step_duration_seconds summary\n"
+
+        for step, durations in sorted(self.steps().items()):
+            labels = f'{tool},step="{step}"'
+
+            for q in QUANTILES:
+                yield (
+                    f"{prefix}_step_duration_seconds"
+                    f'{{{labels},quantile="{q}"}} {quantile(durations, q)}\n'
+                )
+
+            yield (
+                f"{prefix}_step_duration_seconds_sum{{{labels}}}"
+                f" {round(sum(durations), 3)}\n"
+            )
+            yield f"{prefix}_step_duration_seconds_count{{{labels}}} {len(durations)}\n"
+
+        yield f"# HELP {prefix}_systems Processed systems by status.\n"
+        yield f"# TYPE {prefix}_systems gauge\n"
+
+        for status, count in sorted(self.statuses().items()):
+            yield f'{prefix}_systems{{{tool},status="{status}"}} {count}\n'
+
+        yield f"# HELP {prefix}_run_duration_seconds Duration of the run.\n"
+        yield f"# TYPE {prefix}_run_duration_seconds gauge\n"
+        yield f"{prefix}_run_duration_seconds{{{tool}}} {self.elapsed}\n"
+        yield (
+            f"# HELP {prefix}_throughput_systems_per_minute"
+            " Processed systems per minute.\n"
+        )
+        yield f"# TYPE {prefix}_throughput_systems_per_minute gauge\n"
+        yield f"{prefix}_throughput_systems_per_minute{{{tool}}} {self.throughput}\n"
+        yield f"# HELP {prefix}_last_run_timestamp_seconds End of the run.\n"
+        yield f"# TYPE {prefix}_last_run_timestamp_seconds gauge\n"
+        yield f"{prefix}_last_run_timestamp_seconds{{{tool}}} {time()}\n"
+
+        if openmetrics:
+            yield "# EOF\n"
+
+    def write(self, path: Path, *, openmetrics: bool = False) -> None:
+        """Atomically writes the metrics to a textfile."""
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(self.exposition(openmetrics=openmetrics), encoding="utf-8")
+        replace(tmp, path)
+
+
+def get_run_metrics(args: Namespace, tool: str) -> RunMetrics | None:
+    """Returns run metrics if metrics or a summary were requested."""
+
+    if args.metrics is None and not args.summary:
+        return None
+
+    return RunMetrics(tool)
+
+
+def report(args: Namespace) -> None:
+    """Writes the metrics and prints the summary as requested."""
+
+    if (metrics := args.run_metrics) is None:
+        return
+
+    if args.metrics is not None:
+        metrics.write(args.metrics, openmetrics=args.openmetrics)
+
+    if args.summary:
+        print(metrics.summary(), file=stderr)
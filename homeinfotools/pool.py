@@ -0,0 +1,86 @@
+"""Asynchronous processing of systems."""
+
+from asyncio import Queue, create_task, run
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterable
+
+from homeinfotools.logging import LOGGER
+
+
+__all__ = ["map_async", "process", "release_in_flight"]
+
+
+IN_FLIGHT: ContextVar[Callable[[], None] | None] = ContextVar(
+    "in_flight", default=None
+)
+
+
+async def map_async(
+    function: Callable[[int], Awaitable[Any]],
+    systems: Iterable[int],
+    *,
+    concurrency: int,
+    until: Callable[[Any], bool] | None = None,
+) -> None:
+    """Processes the systems with at most <concurrency> systems in flight.
+
+    If the <until> predicate matches a result, no further systems are
+    started, while those in flight are processed to the end.
+    A system may release its place, e.g. while waiting for it to reboot,
+    so that the next system starts in the meantime.
+    """
+
+    queue = Queue()
+
+    for system in systems:
+        queue.put_nowait(system)
+
+    consumers = []
+
+    async def consume() -> None:
+        while not queue.empty():
+            released = False
+
+            def release() -> None:
+                nonlocal released
+
+                if not released and not queue.empty():
+                    released = True
+                    consumers.append(create_task(consume()))
+
+            IN_FLIGHT.set(release)
+            result = await function(queue.get_nowait())
+
+            if until is not None and until(result) and not queue.empty():
+                LOGGER.error("Stopping. Skipping %i pending systems.", queue.qsize())
+
+                while not queue.empty():
+                    queue.get_nowait()
+
+            if released:
+                return
+
+    for _ in range(max(1, min(concurrency, queue.qsize()))):
+        consumers.append(create_task(consume()))
+
+    while consumers:
+        await consumers.pop(0)
+
+
+def process(
+    function: Callable[[int], Awaitable[Any]],
+    systems: Iterable[int],
+    *,
+    concurrency: int,
+    until: Callable[[Any], bool] | None = None,
+) -> None:
+    """Runs the event loop to process the given systems."""
+
+    run(map_async(function, systems, concurrency=concurrency, until=until))
+
+
+def release_in_flight() -> None:
+    """Releases the current system's place among the systems in flight."""
+
+    if (release := IN_FLIGHT.get()) is not None:
+        release()
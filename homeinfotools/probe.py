@@ -0,0 +1,55 @@
+"""Fast reachability probing of systems."""
+
+from asyncio import Semaphore, TimeoutError, gather, open_connection, run, wait_for
+from typing import Iterable
+
+from homeinfotools.logging import LOGGER
+from homeinfotools.ssh import HOSTNAME
+
+
+__all__ = ["is_reachable", "partition", "probe"]
+
+
+CONCURRENCY = 256
+PORT = 22
+
+
+async def is_reachable(system: int, *, timeout: float, port: int = PORT) -> bool:
+    """Checks whether the system accepts TCP connections on the SSH port."""
+
+    try:
+        _, writer = await wait_for(
+            open_connection(HOSTNAME.format(system), port), timeout
+        )
+    except (OSError, TimeoutError):
+        return False
+
+    writer.close()
+    return True
+
+
+async def partition(
+    systems: Iterable[int], *, timeout: float, concurrency: int = CONCURRENCY
+) -> tuple[list[int], list[int]]:
+    """Concurrently probes the systems and splits
+    them into reachable and unreachable systems.
+    """
+
+    semaphore = Semaphore(concurrency)
+
+    async def probe_system(system: int) -> bool:
+        async with semaphore:
+            return await is_reachable(system, timeout=timeout)
+
+    systems = list(systems)
+    reachable = await gather(*map(probe_system, systems))
+    online = [system for system, up in zip(systems, reachable) if up]
+    offline = [system for system, up in zip(systems, reachable) if not up]
+    LOGGER.info("%i systems are reachable, %i are not.", len(online), len(offline))
+    return online, offline
+
+
+def probe(systems: Iterable[int], *, timeout: float) -> tuple[list[int], list[int]]:
+    """Runs the event loop to probe the given systems."""
+
+    return run(partition(systems, timeout=timeout))
@@ -0,0 +1,6 @@
+"""Run sysquery as a module."""
+
+from homeinfotools.query.main import main
+
+
+raise SystemExit(main())
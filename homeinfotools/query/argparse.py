@@ -1,15 +1,17 @@
 """Argument parsing."""
 
-from argparse import ArgumentParser, Namespace
+from argparse import SUPPRESS, ArgumentParser, Namespace
 from pathlib import Path
 
+from homeinfotools.facts import FACTS_CACHE
 from homeinfotools.os import CACHE_DIR
+from homeinfotools.query.output import FORMATS
 
 
 __all__ = ["get_args"]
 
 
-CACHE_FILE = CACHE_DIR / "sysquery.cache"
+CACHE_FILE = CACHE_DIR / "sysquery.sqlite"
 
 
 def get_args() -> Namespace:
@@ -81,6 +83,29 @@ def get_args() -> Namespace:
         metavar="city",
         help="filter by cities",
     )
+    parser.add_argument(
+        "-F",
+        "--filter",
+        metavar="expression",
+        help='filter by an expression, e.g. "os=arch and (city~berlin or zip=10*)"',
+    )
+    parser.add_argument(
+        "--format", choices=FORMATS, default="ids", help="the output format"
+    )
+    parser.add_argument(
+        "--fields",
+        type=lambda fields: fields.split(","),
+        metavar="field,...",
+        help="comma-separated fields or dotted JSON paths to output",
+    )
+    parser.add_argument(
+        "--count", action="store_true", help="only output the amount of systems"
+    )
+    parser.add_argument(
+        "--group-by",
+        metavar="field",
+        help="count systems per value of the given field",
+    )
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="enable verbose mode"
     )
@@ -88,6 +113,15 @@ def get_args() -> Namespace:
     parser.add_argument(
         "-f", "--refresh", action="store_true", help="force refreshing of cache"
     )
+    parser.add_argument(
+        "-S",
+        "--stale",
+        action="store_true",
+        help="answer from an expired cache and refresh it in the background,"
+        " if a HIS session is cached",
+    )
+    # Lock file of a background refresh, which is removed when done.
+    parser.add_argument("--lock-file", type=Path, help=SUPPRESS)
     parser.add_argument(
         "--cache-file",
         type=Path,
@@ -102,4 +136,18 @@ def get_args() -> Namespace:
         metavar="hours",
         help="sets the caching time in hours",
     )
+    parser.add_argument(
+        "--facts-cache",
+        type=Path,
+        default=FACTS_CACHE,
+        metavar="file",
+        help="read facts gathered by sysrpc --facts from the given file",
+    )
+    parser.add_argument(
+        "--facts-ttl",
+        type=int,
+        default=24,
+        metavar="hours",
+        help="ignore facts gathered longer ago than the given hours",
+    )
     return parser.parse_args()
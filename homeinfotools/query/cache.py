@@ -0,0 +1,151 @@
+"""Indexed on-disk cache of systems."""
+
+from contextlib import closing
+from json import dumps, loads
+from pathlib import Path
+from sqlite3 import Connection, DatabaseError, connect
+from typing import Any, Iterator
+
+from homeinfotools.query.filters import WILDCARDS
+
+
+__all__ = [
+    "DatabaseError",
+    "get_meta",
+    "load_systems",
+    "store_systems",
+    "update_meta",
+]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS systems (
+    id INTEGER PRIMARY KEY,
+    operating_system TEXT,  -- casefolded
+    serial_number TEXT,  -- casefolded
+    deployment INTEGER,
+    json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS systems_operating_system ON systems (operating_system);
+CREATE INDEX IF NOT EXISTS systems_serial_number ON systems (serial_number);
+CREATE INDEX IF NOT EXISTS systems_deployment ON systems (deployment);
+"""
+# Caches of other schema versions are discarded and downloaded anew.
+VERSION = 3
+INDEXED_FILTERS = {
+    "id": "id",
+    "os": "operating_system",
+    "sn": "serial_number",
+    "deployment": "deployment",
+}
+
+
+def get_row(system: dict) -> tuple[Any, ...]:
+    """Returns a database row for the given system."""
+
+    return (
+        system.get("id"),
+        casefold(system.get("operatingSystem")),
+        casefold(system.get("serialNumber")),
+        (system.get("deployment") or {}).get("id"),
+        dumps(system, separators=(",", ":")),
+    )
+
+
+def casefold(value: Any) -> str | None:
+    """Casefolds a value like the filters do."""
+
+    return None if value is None else str(value).casefold()
+
+
+def open_cache(path: Path) -> Connection:
+    """Opens the cache database and ensures its schema."""
+
+    connection = connect(path)
+
+    if connection.execute("PRAGMA user_version").fetchone()[0] != VERSION:
+        connection.executescript(
+            "DROP TABLE IF EXISTS meta; DROP TABLE IF EXISTS systems;"
+            f" PRAGMA user_version = {VERSION};"
+        )
+
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def store_systems(path: Path, systems: list[dict], **meta: str | None) -> None:
+    """Replaces the cached systems and updates the metadata."""
+
+    with closing(open_cache(path)) as connection, connection:
+        connection.execute("DELETE FROM systems")
+        connection.executemany(
+            "INSERT OR REPLACE INTO systems VALUES (?, ?, ?, ?, ?)",
+            map(get_row, systems),
+        )
+        set_meta(connection, meta)
+
+
+def update_meta(path: Path, **meta: str | None) -> None:
+    """Updates the metadata of the cache."""
+
+    with closing(open_cache(path)) as connection, connection:
+        set_meta(connection, meta)
+
+
+def set_meta(connection: Connection, meta: dict[str, str | None]) -> None:
+    """Sets the given metadata, removing keys with None values."""
+
+    for key, value in meta.items():
+        if value is None:
+            connection.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value)
+            )
+
+
+def get_meta(path: Path) -> dict[str, str]:
+    """Returns the metadata of the cache."""
+
+    with closing(open_cache(path)) as connection:
+        return dict(connection.execute("SELECT key, value FROM meta"))
+
+
+def load_systems(path: Path, **filters: list | None) -> Iterator[dict]:
+    """Yields cached systems, narrowed down by exact-match
+    filters on indexed columns, where given.
+
+    Filters with wildcards are left to the filter expression.
+    """
+
+    conditions = []
+    parameters = []
+
+    for name, values in filters.items():
+        if not values:
+            continue
+
+        values = [
+            casefold(value) if isinstance(value, str) else value for value in values
+        ]
+
+        if any(isinstance(value, str) and WILDCARDS & set(value) for value in values):
+            continue
+
+        conditions.append(
+            f"{INDEXED_FILTERS[name]} IN ({', '.join('?' * len(values))})"
+        )
+        parameters.extend(values)
+
+    query = "SELECT json FROM systems"
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    with closing(open_cache(path)) as connection:
+        for (json,) in connection.execute(query, parameters):
+            yield loads(json)
@@ -0,0 +1,400 @@
+"""Boolean filter expressions for systems.
+
+Expressions consist of terms like "os=arch", "city~berlin" or
+"type!=DDB", which can be combined using "and", "or", "not" and
+parentheses, e.g.: os=arch and (city~berlin or zip=10*) and not type=DDB
+
+    =   equals, supporting the wildcards * and ?
+    !=  does not equal
+    ~   contains
+    <, <=, >, >=    compares numbers or package versions
+
+All comparisons ignore the case.
+
+Facts gathered by "sysrpc --facts" are available as fields as well,
+e.g. "kernel~lts", "disk_free<1000000000" or "pkg.linux<6.1".
+"""
+
+from fnmatch import translate
+from re import VERBOSE, compile as compile_regex
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from homeinfotools.facts import compare_versions
+
+
+__all__ = [
+    "FIELDS",
+    "FilterSyntaxError",
+    "And",
+    "Not",
+    "Or",
+    "Term",
+    "compile_filter",
+    "get_fields",
+    "get_getter",
+    "is_fact",
+    "parse",
+]
+
+
+Record = dict[str, tuple[str, ...]]
+Predicate = Callable[[Record], bool]
+TOKENS = compile_regex(
+    r"""\s*(?:
+        (?P<paren>[()])
+        |(?P<field>[A-Za-z_][\w.-]*)\s*(?P<operator>!=|<=|>=|=|~|<|>)\s*
+         (?P<value>"[^"]*"|'[^']*'|[^\s()]+)
+        |(?P<keyword>\w+)
+    )""",
+    flags=VERBOSE,
+)
+WILDCARDS = frozenset("*?[")
+
+
+class FilterSyntaxError(ValueError):
+    """Indicates a syntax error in a filter expression."""
+
+
+class Term(NamedTuple):
+    """Compares a field with a value."""
+
+    field: str
+    operator: str
+    value: str
+
+
+class Not(NamedTuple):
+    """Negates an expression."""
+
+    operand: "Expression"
+
+
+class And(NamedTuple):
+    """Matches if all expressions match."""
+
+    operands: tuple
+
+
+class Or(NamedTuple):
+    """Matches if any expression matches."""
+
+    operands: tuple
+
+
+Expression = Term | Not | And | Or
+
+
+def _deployment(system: dict) -> dict:
+    """Returns the deployment of the system."""
+
+    return system.get("deployment") or {}
+
+
+def _customer(system: dict) -> dict:
+    """Returns the customer of the system."""
+
+    return _deployment(system).get("customer") or {}
+
+
+def _company(system: dict) -> dict:
+    """Returns the company of the system's customer."""
+
+    return _customer(system).get("company") or {}
+
+
+def _address(system: dict) -> dict:
+    """Returns the address of the system's deployment."""
+
+    return _deployment(system).get("address") or {}
+
+
+def _facts(system: dict) -> dict:
+    """Returns the cached facts of the system."""
+
+    return system.get("facts") or {}
+
+
+FIELDS: dict[str, Callable[[dict], Iterable]] = {
+    "id": lambda system: [system.get("id")],
+    "os": lambda system: [system.get("operatingSystem")],
+    "sn": lambda system: [system.get("serialNumber")],
+    "deployment": lambda system: [_deployment(system).get("id")],
+    "type": lambda system: [_deployment(system).get("type")],
+    "customer": lambda system: [_customer(system).get("id")],
+    "company": lambda system: [
+        _company(system).get("name"),
+        _company(system).get("abbreviation"),
+    ],
+    "street": lambda system: [_address(system).get("street")],
+    "house_number": lambda system: [_address(system).get("houseNumber")],
+    "zip": lambda system: [_address(system).get("zipCode")],
+    "city": lambda system: [_address(system).get("city")],
+    "kernel": lambda system: [_facts(system).get("kernel")],
+    "hostname": lambda system: [_facts(system).get("hostname")],
+    "uptime": lambda system: [_facts(system).get("uptime")],
+    "disk_free": lambda system: [_facts(system).get("disk_free")],
+    "disk_size": lambda system: [_facts(system).get("disk_size")],
+    "memory": lambda system: [_facts(system).get("memory")],
+}
+FACTS = {"kernel", "hostname", "uptime", "disk_free", "disk_size", "memory"}
+PACKAGE = "pkg."
+ALIASES = {"zip_code": "zip", "houseNumber": "house_number", "zipCode": "zip"}
+ORDERINGS = {
+    "<": lambda result: result < 0,
+    "<=": lambda result: result <= 0,
+    ">": lambda result: result > 0,
+    ">=": lambda result: result >= 0,
+}
+
+
+def get_getter(field: str) -> Callable[[dict], Iterable] | None:
+    """Returns the getter of the given field, including package versions."""
+
+    if (getter := FIELDS.get(ALIASES.get(field, field))) is not None:
+        return getter
+
+    if field.startswith(PACKAGE) and (package := field[len(PACKAGE) :]):
+        return lambda system: [_facts(system).get("packages", {}).get(package)]
+
+    return None
+
+
+def is_fact(field: str) -> bool:
+    """Determines whether the field refers to cached facts."""
+
+    return field in FACTS or field.startswith((PACKAGE, "facts."))
+
+
+def tokenize(expression: str) -> Iterator[tuple[str, ...]]:
+    """Yields tokens of the expression."""
+
+    position = 0
+
+    while expression[position:].strip():
+        if (match := TOKENS.match(expression, position)) is None:
+            raise FilterSyntaxError(
+                f"Invalid token at position {position}: {expression[position:]!r}"
+            )
+
+        position = match.end()
+
+        if paren := match.group("paren"):
+            yield (paren,)
+        elif keyword := match.group("keyword"):
+            if keyword.casefold() not in {"and", "or", "not"}:
+                raise FilterSyntaxError(f"Unexpected word: {keyword!r}")
+
+            yield (keyword.casefold(),)
+        else:
+            value = match.group("value")
+
+            if value[0] in "\"'":
+                value = value[1:-1]
+
+            yield ("term", match.group("field"), match.group("operator"), value)
+
+
+class Parser:
+    """Recursive descent parser for filter expressions."""
+
+    def __init__(self, expression: str):
+        self.tokens = list(tokenize(expression))
+        self.position = 0
+
+    def peek(self) -> str | None:
+        """Returns the type of the next token."""
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][0]
+
+        return None
+
+    def take(self) -> tuple[str, ...]:
+        """Consumes the next token."""
+        if self.peek() is None:
+            raise FilterSyntaxError("Unexpected end of expression.")
+
+        self.position += 1
+        return self.tokens[self.position - 1]
+
+    def parse(self) -> Expression:
+        """Parses the whole expression."""
+        expression = self.parse_or()
+
+        if self.peek() is not None:
+            raise FilterSyntaxError(f"Unexpected token: {self.take()[0]!r}")
+
+        return expression
+
+    def parse_or(self) -> Expression:
+        """Parses a disjunction."""
+        operands = [self.parse_and()]
+
+        while self.peek() == "or":
+            self.take()
+            operands.append(self.parse_and())
+
+        return operands[0] if len(operands) == 1 else Or(tuple(operands))
+
+    def parse_and(self) -> Expression:
+        """Parses a conjunction."""
+        operands = [self.parse_not()]
+
+        while self.peek() == "and":
+            self.take()
+            operands.append(self.parse_not())
+
+        return operands[0] if len(operands) == 1 else And(tuple(operands))
+
+    def parse_not(self) -> Expression:
+        """Parses a negation or an atom."""
+        if (token := self.take())[0] == "not":
+            return Not(self.parse_not())
+
+        if token[0] == "(":
+            expression = self.parse_or()
+
+            if self.take()[0] != ")":
+                raise FilterSyntaxError("Missing closing parenthesis.")
+
+            return expression
+
+        if token[0] == "term":
+            return make_term(*token[1:])
+
+        raise FilterSyntaxError(f"Unexpected token: {token[0]!r}")
+
+
+def make_term(field: str, operator: str, value: str) -> Term:
+    """Creates a term, validating the field name."""
+
+    if get_getter(field := ALIASES.get(field, field)) is None:
+        raise FilterSyntaxError(f"Unknown field: {field!r}")
+
+    return Term(field, operator, value)
+
+
+def parse(expression: str) -> Expression:
+    """Parses a filter expression."""
+
+    return Parser(expression).parse()
+
+
+def get_fields(expression: Expression) -> set[str]:
+    """Returns the fields referenced by the expression."""
+
+    if isinstance(expression, Term):
+        return {expression.field}
+
+    if isinstance(expression, Not):
+        return get_fields(expression.operand)
+
+    return set().union(*map(get_fields, expression.operands))
+
+
+def compile_term(term: Term) -> Predicate:
+    """Compiles a term into a predicate."""
+
+    field, needle = term.field, term.value.casefold()
+
+    if (ordering := ORDERINGS.get(term.operator)) is not None:
+        return lambda record: any(
+            ordering(compare(value, needle)) for value in record[field]
+        )
+
+    if term.operator == "~":
+        return lambda record: any(needle in value for value in record[field])
+
+    if WILDCARDS.intersection(needle):
+        match = compile_regex(translate(needle)).match
+        predicate = lambda record: any(map(match, record[field]))
+    else:
+        predicate = lambda record: needle in record[field]
+
+    if term.operator == "!=":
+        return lambda record: not predicate(record)
+
+    return predicate
+
+
+def compare(value: str, other: str) -> int:
+    """Compares two values numerically if possible or else as versions."""
+
+    try:
+        number, other_number = float(value), float(other)
+    except ValueError:
+        return compare_versions(value, other)
+
+    return (number > other_number) - (number < other_number)
+
+
+def compile_or(expression: Or) -> Predicate:
+    """Compiles a disjunction, merging plain
+    equality terms on the same field into set lookups.
+    """
+
+    sets: dict[str, set[str]] = {}
+    others = []
+
+    for operand in expression.operands:
+        if (
+            isinstance(operand, Term)
+            and operand.operator == "="
+            and not WILDCARDS.intersection(operand.value)
+        ):
+            sets.setdefault(operand.field, set()).add(operand.value.casefold())
+        else:
+            others.append(compile_expression(operand))
+
+    predicates = [
+        intersects(field, frozenset(needles)) for field, needles in sets.items()
+    ]
+    predicates.extend(others)
+    return lambda record: any(predicate(record) for predicate in predicates)
+
+
+def intersects(field: str, needles: frozenset[str]) -> Predicate:
+    """Returns a predicate checking whether the field has any of the values."""
+
+    return lambda record: not needles.isdisjoint(record[field])
+
+
+def compile_expression(expression: Expression) -> Predicate:
+    """Compiles an expression into a predicate on records."""
+
+    if isinstance(expression, Term):
+        return compile_term(expression)
+
+    if isinstance(expression, Not):
+        predicate = compile_expression(expression.operand)
+        return lambda record: not predicate(record)
+
+    if isinstance(expression, Or):
+        return compile_or(expression)
+
+    predicates = [compile_expression(operand) for operand in expression.operands]
+    return lambda record: all(predicate(record) for predicate in predicates)
+
+
+def compile_filter(expression: Expression) -> Callable[[dict], bool]:
+    """Compiles an expression into a predicate on systems.
+
+    Only the referenced fields are extracted from each system and they are
+    casefolded exactly once, before the expression is evaluated.
+    """
+
+    predicate = compile_expression(expression)
+    getters = [(field, get_getter(field)) for field in get_fields(expression)]
+
+    def match(system: dict) -> bool:
+        return predicate(
+            {
+                field: tuple(
+                    str(value).casefold()
+                    for value in getter(system)
+                    if value is not None
+                )
+                for field, getter in getters
+            }
+        )
+
+    return match
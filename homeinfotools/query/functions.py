@@ -2,143 +2,249 @@
 
 from argparse import Namespace
 from datetime import datetime, timedelta
-from functools import partial
-from json import dump, load
-from typing import Iterable
+from subprocess import DEVNULL, Popen
+from sys import executable
+from typing import Iterable, Iterator
 
-from homeinfotools.his import update_credentials, HISSession
+from requests import Response
+
+from homeinfotools.facts import load_facts
+from homeinfotools.his import HISSession
 from homeinfotools.logging import LOGGER
+from homeinfotools.os import CACHE_DIR
+from homeinfotools.query.cache import DatabaseError
+from homeinfotools.query.cache import get_meta
+from homeinfotools.query.cache import load_systems
+from homeinfotools.query.cache import store_systems
+from homeinfotools.query.cache import update_meta
+from homeinfotools.query.filters import And, Or, Term
+from homeinfotools.query.filters import PACKAGE, compile_filter, get_fields
+from homeinfotools.query.filters import is_fact, parse
 
 
 __all__ = ["get_systems", "filter_systems"]
 
 
 SYSTEMS_URL = "https://termgr.homeinfo.de/list/systems"
+LOCK_TIME = 10 * 60
+REFRESH_LOG = CACHE_DIR / "sysquery-refresh.log"
+REFRESH_MODULE = "homeinfotools.query"
 
 
-def query_systems(account: str, passwd: str) -> list:
-    """Query systems."""
+def query_systems(args: Namespace, meta: dict[str, str]) -> Response | None:
+    """Query systems unless they have not been
+    modified since the cache was last refreshed.
+    """
 
     LOGGER.debug("Querying systems.")
 
-    with HISSession(account, passwd) as session:
-        return session.get_json(SYSTEMS_URL)
+    with HISSession(args.user) as session:
+        return session.get_modified(
+            SYSTEMS_URL,
+            etag=meta.get("etag"),
+            last_modified=meta.get("lastModified"),
+        )
+
+
+def refresh_systems(args: Namespace, meta: dict[str, str]) -> Iterable[dict]:
+    """Refreshes the cache and returns the systems."""
+
+    if (response := query_systems(args, meta)) is None:
+        LOGGER.info("Systems have not been modified.")
+        update_meta(args.cache_file, timestamp=datetime.now().isoformat())
+        return load_cached_systems(args)
+
+    systems = response.json()
+    store_systems(
+        args.cache_file,
+        systems,
+        timestamp=datetime.now().isoformat(),
+        etag=response.headers.get("ETag"),
+        lastModified=response.headers.get("Last-Modified"),
+    )
+    return systems
 
 
-def cache_systems(systems: list, args: Namespace) -> list:
-    """Caches the systems and returns them."""
+def has_session(args: Namespace) -> bool:
+    """Checks whether a HIS session is cached, so
+    that no credentials need to be queried.
+    """
 
-    cache = {"timestamp": datetime.now().isoformat(), "systems": systems}
+    return HISSession(args.user).load_cookies()
 
-    with args.cache_file.open("w") as file:
-        dump(cache, file)
 
-    return systems
+def refresh_in_background(args: Namespace) -> None:
+    """Spawns a detached process that refreshes the cache,
+    unless another one has been spawned recently.
 
+    The process logs to REFRESH_LOG and removes the lock file when done.
+    """
 
-def systems_from_cache(args: Namespace) -> list:
-    """Returns cached systems."""
+    lock_file = args.cache_file.with_suffix(".lock")
 
-    if not args.cache_file.exists():
-        LOGGER.info("Initializing cache.")
-        systems = query_systems(*update_credentials(args.user))
-        return cache_systems(systems, args)
+    try:
+        if datetime.now().timestamp() - lock_file.stat().st_mtime < LOCK_TIME:
+            LOGGER.debug("Cache is already being refreshed.")
+            return
+    except FileNotFoundError:
+        pass
 
-    LOGGER.debug("Loading cache.")
+    lock_file.touch()
+    command = [
+        executable,
+        "-m",
+        REFRESH_MODULE,
+        "--refresh",
+        "--cache-file",
+        str(args.cache_file),
+        "--lock-file",
+        str(lock_file),
+    ]
 
-    with args.cache_file.open("r") as file:
-        cache = load(file)
+    if args.user:
+        command += ["--user", args.user]
 
-    if timestamp := cache.get("timestamp"):
-        timestamp = datetime.fromisoformat(timestamp)
+    LOGGER.info("Refreshing cache in the background.")
+    REFRESH_LOG.parent.mkdir(parents=True, exist_ok=True)
 
-        if timestamp + timedelta(hours=args.cache_time) > datetime.now():
-            return cache["systems"]
+    with REFRESH_LOG.open("a") as log:
+        Popen(
+            command, stdin=DEVNULL, stdout=DEVNULL, stderr=log, start_new_session=True
+        )
 
-        LOGGER.info("Cache has expired.")
-    else:
-        LOGGER.warning("Corrupted cache.")
 
-    return cache_systems(query_systems(*update_credentials(args.user)), args)
+def load_cached_systems(args: Namespace) -> Iterable[dict]:
+    """Loads the systems from the cache."""
 
+    return load_systems(
+        args.cache_file,
+        id=args.id,
+        os=args.os,
+        sn=args.sn,
+        deployment=args.deployment,
+    )
 
-def get_systems(args: Namespace) -> list:
-    """Returns systems."""
 
-    if args.refresh:
-        systems = query_systems(*update_credentials(args.user))
-        return cache_systems(systems, args)
+def get_cache_meta(args: Namespace) -> dict[str, str]:
+    """Returns the metadata of the cache, discarding a corrupted cache."""
 
-    return systems_from_cache(args)
+    if not args.cache_file.exists():
+        return {}
 
+    try:
+        return get_meta(args.cache_file)
+    except DatabaseError:
+        LOGGER.warning("Corrupted cache.")
+        args.cache_file.unlink()
+        return {}
 
-def substr_ic_in(string: str, haystack: Iterable[str]) -> bool:
-    """Checks whether the string is a substring of
-    any strings in the iterable, ignoring the case.
-    """
 
-    if not string:
-        return False
+def systems_from_cache(args: Namespace) -> Iterable[dict]:
+    """Returns cached systems."""
 
-    string = string.casefold()
-    return any(substring in string for substring in haystack)
+    LOGGER.debug("Loading cache.")
 
+    if not (timestamp := (meta := get_cache_meta(args)).get("timestamp")):
+        LOGGER.info("Initializing cache.")
+        return refresh_systems(args, meta)
 
-def match_system(system: dict, *, args: Namespace) -> bool:
-    """Matches the system to the filters."""
+    expires = datetime.fromisoformat(timestamp) + timedelta(hours=args.cache_time)
 
-    if args.id and system.get("id") not in args.id:
-        return False
+    if expires > datetime.now():
+        return load_cached_systems(args)
 
-    if args.os and system.get("operatingSystem") not in args.os:
-        return False
+    LOGGER.info("Cache has expired.")
 
-    if args.sn and system.get("serialNumber") not in args.sn:
-        return False
+    if args.stale:
+        # The detached process cannot query credentials.
+        if has_session(args):
+            refresh_in_background(args)
+            return load_cached_systems(args)
 
-    deployment = system.get("deployment") or {}
+        LOGGER.warning("No cached HIS session. Refreshing in the foreground.")
 
-    if args.deployment and deployment.get("id") not in args.deployment:
-        return False
+    return refresh_systems(args, meta)
 
-    if args.customer:
-        customer = deployment.get("customer") or {}
-        company = customer.get("company") or {}
 
-        if cid := customer.get("id"):
-            match = str(cid) in args.customer
-        else:
-            match = False
+def get_systems(args: Namespace) -> Iterable[dict]:
+    """Returns systems."""
 
-        match = match or substr_ic_in(company.get("name"), args.customer)
-        match = match or substr_ic_in(company.get("abbreviation"), args.customer)
+    if args.refresh:
+        try:
+            return refresh_systems(args, get_cache_meta(args))
+        finally:
+            if args.lock_file is not None:
+                args.lock_file.unlink(missing_ok=True)
+
+    return systems_from_cache(args)
 
-        if not match:
-            return False
 
-    if args.type and deployment.get("type") not in args.type:
-        return False
+def get_expression(args: Namespace) -> And:
+    """Returns the filter expression for the command line arguments."""
 
-    address = deployment.get("address") or {}
+    operands = []
 
-    if args.street and not substr_ic_in(address.get("street"), args.street):
-        return False
+    for field, operator, values in [
+        ("id", "=", args.id),
+        ("os", "=", args.os),
+        ("sn", "=", args.sn),
+        ("deployment", "=", args.deployment),
+        ("type", "=", args.type),
+        ("street", "~", args.street),
+        ("house_number", "~", args.house_number),
+        ("zip", "~", args.zip_code),
+        ("city", "~", args.city),
+    ]:
+        if values:
+            operands.append(
+                Or(tuple(Term(field, operator, str(value)) for value in values))
+            )
 
-    if args.house_number and not substr_ic_in(
-        address.get("houseNumber"), args.house_number
-    ):
-        return False
+    if args.customer:
+        operands.append(
+            Or(
+                (
+                    *(Term("customer", "=", customer) for customer in args.customer),
+                    *(Term("company", "~", customer) for customer in args.customer),
+                )
+            )
+        )
+
+    if args.filter:
+        operands.append(parse(args.filter))
+
+    return And(tuple(operands))
+
+
+def add_facts(
+    systems: Iterable[dict], args: Namespace, fields: set[str]
+) -> Iterator[dict]:
+    """Adds the cached facts to the systems, including the
+    versions of the packages referenced by the fields.
+    """
 
-    if args.zip_code and not substr_ic_in(address.get("zipCode"), args.zip_code):
-        return False
+    packages = {field[len(PACKAGE) :] for field in fields if field.startswith(PACKAGE)}
+    facts = load_facts(
+        args.facts_cache, max_age=args.facts_ttl * 3600, packages=packages
+    )
 
-    if args.city and not substr_ic_in(address.get("city"), args.city):
-        return False
+    for system in systems:
+        if (system_facts := facts.get(system.get("id"))) is not None:
+            system["facts"] = system_facts
 
-    return True
+        yield system
 
 
-def filter_systems(systems: list, args: Namespace) -> Iterable[dict]:
+def filter_systems(systems: Iterable[dict], args: Namespace) -> Iterable[dict]:
     """Filter systems according to the args."""
 
-    return filter(partial(match_system, args=args), systems)
+    expression = get_expression(args)
+    fields = get_fields(expression).union(args.fields or ())
+
+    if args.group_by:
+        fields.add(args.group_by)
+
+    if any(map(is_fact, fields)):
+        systems = add_facts(systems, args, fields)
+
+    return filter(compile_filter(expression), systems)
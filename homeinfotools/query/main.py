@@ -1,19 +1,22 @@
 """Main script."""
 
 from logging import DEBUG, INFO, WARNING, basicConfig
+from sys import stdout
 
 from homeinfotools.functions import handle_keyboard_interrupt
 from homeinfotools.his import ErrorHandler
 from homeinfotools.logging import LOG_FORMAT, LOGGER
 from homeinfotools.query.argparse import get_args
+from homeinfotools.query.filters import FilterSyntaxError
 from homeinfotools.query.functions import filter_systems, get_systems
+from homeinfotools.query.output import count_systems, print_systems
 
 
 __all__ = ["main"]
 
 
 @handle_keyboard_interrupt
-def main() -> None:
+def main() -> int | None:
     """Runs the script."""
 
     args = get_args()
@@ -24,5 +27,15 @@ def main() -> None:
     with ErrorHandler("Error during JSON data retrieval."):
         systems = get_systems(args)
 
-    for system in filter_systems(systems, args):
-        print(system.get("id"))
+    try:
+        systems = filter_systems(systems, args)
+    except FilterSyntaxError as error:
+        LOGGER.error("Invalid filter expression: %s", error)
+        return 2
+
+    if args.count or args.group_by:
+        count_systems(
+            systems, stdout, group_by=args.group_by, output_format=args.format
+        )
+    else:
+        print_systems(systems, stdout, output_format=args.format, fields=args.fields)
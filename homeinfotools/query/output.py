@@ -0,0 +1,132 @@
+"""Output of systems."""
+
+from collections import Counter
+from csv import writer
+from json import dumps
+from typing import Any, Iterable, TextIO
+
+from homeinfotools.query.filters import get_getter
+
+
+__all__ = ["FORMATS", "DEFAULT_FIELDS", "count_systems", "print_systems"]
+
+
+FORMATS = ["ids", "tsv", "csv", "jsonl", "json"]
+DEFAULT_FIELDS = [
+    "id",
+    "os",
+    "sn",
+    "deployment",
+    "customer",
+    "street",
+    "house_number",
+    "zip",
+    "city",
+]
+
+
+def get_value(system: dict, field: str) -> Any:
+    """Returns the value of a known field or of a dotted JSON path."""
+
+    if (getter := get_getter(field)) is not None:
+        values = [value for value in getter(system) if value is not None]
+        return values[0] if len(values) == 1 else values or None
+
+    value = system
+
+    for key in field.split("."):
+        if not isinstance(value, dict):
+            return None
+
+        value = value.get(key)
+
+    return value
+
+
+def to_text(value: Any) -> str:
+    """Converts a value into a table cell."""
+
+    if value is None:
+        return ""
+
+    if isinstance(value, list):
+        return ",".join(map(to_text, value))
+
+    if isinstance(value, dict):
+        return dumps(value)
+
+    return str(value)
+
+
+def get_record(system: dict, fields: list[str] | None) -> dict:
+    """Returns the selected fields of the system or the entire system."""
+
+    if fields is None:
+        return system
+
+    return {field: get_value(system, field) for field in fields}
+
+
+def print_systems(
+    systems: Iterable[dict],
+    file: TextIO,
+    *,
+    output_format: str = "ids",
+    fields: list[str] | None = None,
+) -> None:
+    """Writes the systems in the given format, one at a time."""
+
+    if output_format == "ids":
+        for system in systems:
+            print(system.get("id"), file=file)
+    elif output_format in {"tsv", "csv"}:
+        fields = fields or DEFAULT_FIELDS
+        rows = writer(
+            file,
+            delimiter="\t" if output_format == "tsv" else ",",
+            lineterminator="\n",
+        )
+        rows.writerow(fields)
+
+        for system in systems:
+            rows.writerow([to_text(get_value(system, field)) for field in fields])
+    elif output_format == "jsonl":
+        for system in systems:
+            print(dumps(get_record(system, fields)), file=file)
+    elif output_format == "json":
+        separator = "[\n"
+
+        for system in systems:
+            file.write(separator + dumps(get_record(system, fields)))
+            separator = ",\n"
+
+        file.write("[]\n" if separator == "[\n" else "\n]\n")
+    else:
+        raise ValueError(f"Invalid format: {output_format}")
+
+
+def count_systems(
+    systems: Iterable[dict],
+    file: TextIO,
+    *,
+    group_by: str | None = None,
+    output_format: str = "ids",
+) -> None:
+    """Writes the amount of systems, optionally grouped by a field."""
+
+    if group_by is None:
+        print(sum(1 for _ in systems), file=file)
+        return
+
+    counts = Counter(to_text(get_value(system, group_by)) for system in systems)
+
+    if output_format in {"jsonl", "json"}:
+        print(dumps(dict(counts.most_common())), file=file)
+        return
+
+    rows = writer(
+        file, delimiter="," if output_format == "csv" else "\t", lineterminator="\n"
+    )
+
+    for value, count in counts.most_common():
+        rows.writerow([value, count])
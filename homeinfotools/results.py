@@ -0,0 +1,109 @@
+"""Streaming of results."""
+
+from contextlib import contextmanager
+from json import dump, dumps, loads
+from pathlib import Path
+from tempfile import TemporaryFile
+from typing import Iterator, TextIO
+
+
+__all__ = [
+    "DONE",
+    "FAILED",
+    "OFFLINE",
+    "TIMEOUT",
+    "ResultsWriter",
+    "completed_systems",
+    "failed",
+    "read_results",
+    "results_writer",
+]
+
+
+DONE = "done"
+FAILED = "failed"
+OFFLINE = "offline"
+TIMEOUT = "timeout"
+
+
+def failed(result: dict) -> bool:
+    """Determines whether processing the system failed
+    while it was reachable.
+    """
+
+    return result["status"] not in {DONE, OFFLINE}
+
+
+class ResultsWriter:
+    """Writes the results of systems as JSON Lines as soon as they are done."""
+
+    __slots__ = ("file",)
+
+    def __init__(self, file: TextIO | None = None):
+        """Sets the file to write to, discarding results if it is None."""
+        self.file = file
+
+    def __setitem__(self, system: int, result: dict) -> None:
+        """Writes the result of the given system."""
+        if self.file is None:
+            return
+
+        self.file.write(dumps({"system": system, **result}) + "\n")
+        self.file.flush()
+
+
+def read_results(file: TextIO) -> dict[int, dict]:
+    """Reads results from a JSON Lines file.
+
+    Later records of a system supersede earlier ones.
+    """
+
+    results = {}
+
+    for line in file:
+        if not line.strip():
+            continue
+
+        record = loads(line)
+        results[record.pop("system")] = record
+
+    return results
+
+
+@contextmanager
+def results_writer(
+    jsonl: Path | None = None, json: Path | None = None, *, append: bool = False
+) -> Iterator[ResultsWriter]:
+    """Streams results to a JSON Lines file and optionally
+    converts them into a JSON file once the job has ended.
+    """
+
+    if jsonl is None and json is None:
+        yield ResultsWriter()
+        return
+
+    with (
+        TemporaryFile("w+") if jsonl is None else jsonl.open("a+" if append else "w+")
+    ) as file:
+        try:
+            yield ResultsWriter(file)
+        finally:
+            if json is not None:
+                file.seek(0)
+
+                with json.open("w") as json_file:
+                    dump(read_results(file), json_file, indent=2)
+
+
+def completed_systems(path: Path) -> set[int]:
+    """Returns the systems that have been completed according to a journal."""
+
+    if not path.exists():
+        return set()
+
+    with path.open("r") as file:
+        results = read_results(file)
+
+    return {
+        system for system, result in results.items() if result.get("status") == DONE
+    }
@@ -0,0 +1,137 @@
+"""Retrying of failed steps per error class.
+
+A failed step is classified by its outcome and retried as permitted by
+the policy of its error class, after an exponential back-off with jitter.
+Steps that may not be safe to repeat, e.g. arbitrary commands, are only
+retried if their command did not run, i.e. the connection could not be
+established or the package database was locked, unless explicitly enabled.
+While backing off, a system holds neither a step limit nor a shared step
+slot, but queues up for them again like any other system.
+"""
+
+from argparse import ArgumentTypeError
+from random import uniform
+from subprocess import CompletedProcess
+from typing import Container, NamedTuple
+
+
+__all__ = [
+    "DEFAULT_POLICIES",
+    "ERROR_CLASSES",
+    "SAFE_STEPS",
+    "SYSTEM_ERRORS",
+    "RetryPolicy",
+    "classify",
+    "get_retry_policies",
+    "get_step_policies",
+    "retry_delay",
+    "retry_policy",
+]
+
+
+ERROR_CLASSES = ("connect", "ssh", "timeout", "dblock", "io", "other")
+# Messages of ssh failing to establish a connection.
+CONNECT_ERRORS = (
+    "ssh: connect to host",
+    "Connection refused",
+    "Connection timed out",
+    "Could not resolve hostname",
+)
+LOCKED = "unable to lock database"
+# The command of a step has not run after these errors.
+NOT_RUN = frozenset({"connect", "dblock"})
+# These errors concern individual systems rather than the step's load.
+SYSTEM_ERRORS = frozenset({"connect", "ssh", "io"})
+SAFE_STEPS = frozenset({"checkupdates", "facts", "hash", "keyring", "pkgcache"})
+MAX_DELAY = 300
+
+
+class RetryPolicy(NamedTuple):
+    """Amount of retries and the initial delay in seconds."""
+
+    retries: int
+    delay: float
+
+
+DEFAULT_POLICIES = {
+    "connect": RetryPolicy(3, 2),
+    "ssh": RetryPolicy(3, 2),
+    "dblock": RetryPolicy(3, 30),
+}
+
+
+def classify(completed_process: CompletedProcess) -> str:
+    """Returns the error class of a failed step."""
+
+    if completed_process.returncode == 255:
+        if any(error in (completed_process.stderr or "") for error in CONNECT_ERRORS):
+            return "connect"
+
+        return "ssh"
+
+    if completed_process.returncode == 126:
+        return "io"
+
+    if LOCKED in (completed_process.stderr or ""):
+        return "dblock"
+
+    return "other"
+
+
+def retry_delay(
+    policies: dict[str, RetryPolicy], error: str, attempt: int
+) -> float | None:
+    """Returns the seconds to wait before retrying after the given failed
+    attempt or None if the error class is not to be retried (any more).
+    """
+
+    if (policy := policies.get(error)) is None or attempt > policy.retries:
+        return None
+
+    return min(policy.delay * 2 ** (attempt - 1), MAX_DELAY) * uniform(0.5, 1)
+
+
+def retry_policy(string: str) -> tuple[str, RetryPolicy]:
+    """Parses a retry policy like "ssh=3" or "dblock=3:30"."""
+
+    try:
+        error, policy = string.split("=")
+        retries, _, delay = policy.partition(":")
+        default = DEFAULT_POLICIES.get(error, RetryPolicy(0, 2))
+        policy = RetryPolicy(int(retries), float(delay) if delay else default.delay)
+    except ValueError:
+        raise ArgumentTypeError(f"Invalid retry policy: {string}") from None
+
+    if error not in ERROR_CLASSES:
+        raise ArgumentTypeError(f"Invalid error class: {error}")
+
+    # The remote command not being executable will not fix itself.
+    if error == "io" and policy.retries:
+        raise ArgumentTypeError("I/O errors are never retried.")
+
+    return error, policy
+
+
+def get_retry_policies(
+    policies: list[tuple[str, RetryPolicy]],
+) -> dict[str, RetryPolicy]:
+    """Returns the default and given retry policies."""
+
+    return {
+        error: policy
+        for error, policy in {**DEFAULT_POLICIES, **dict(policies)}.items()
+        if policy.retries > 0
+    }
+
+
+def get_step_policies(
+    policies: dict[str, RetryPolicy], step: str, steps: Container[str]
+) -> dict[str, RetryPolicy]:
+    """Returns the retry policies applying to the step,
+    given the steps that are safe to repeat.
+    """
+
+    if step in steps:
+        return policies
+
+    return {error: policy for error, policy in policies.items() if error in NOT_RUN}
@@ -1,9 +1,14 @@
 """Argument parsing."""
 
 from argparse import ArgumentParser, Namespace
-from multiprocessing import cpu_count
 from pathlib import Path
 
+from homeinfotools.facts import FACTS_CACHE
+from homeinfotools.limiter import step_limit
+from homeinfotools.retry import retry_policy
+from homeinfotools.rpc.common import STEPS
+from homeinfotools.rpc.rollout import percentage
+
 
 __all__ = ["get_args"]
 
@@ -16,12 +21,38 @@ def get_args() -> Namespace:
     parser.add_argument(
         "-S", "--sysupgrade", action="store_true", help="upgrade the systems"
     )
+    parser.add_argument(
+        "-U",
+        "--check-updates",
+        action="store_true",
+        help="check the systems for pending updates and print them grouped"
+        " by identical updates",
+    )
+    parser.add_argument(
+        "--skip-current",
+        action="store_true",
+        help="do not upgrade systems without pending updates",
+    )
     parser.add_argument(
         "-X", "--execute", metavar="command", help="execute the commands on the systems"
     )
+    parser.add_argument(
+        "-f",
+        "--facts",
+        action="store_true",
+        help="gather facts about the systems into the facts cache",
+    )
     parser.add_argument(
         "-R", "--reboot", action="store_true", help="reboot the systems"
     )
+    parser.add_argument(
+        "-W",
+        "--wait-online",
+        type=int,
+        metavar="seconds",
+        help="after rebooting, wait up to the given seconds for each system"
+        " to be back online, without keeping it in flight",
+    )
     parser.add_argument(
         "-c",
         "--cleanup",
@@ -31,6 +62,13 @@ def get_args() -> Namespace:
     parser.add_argument(
         "-d", "--debug", action="store_true", help="enable debug logging"
     )
+    parser.add_argument(
+        "--facts-cache",
+        type=Path,
+        default=FACTS_CACHE,
+        metavar="file",
+        help="the facts cache to write to",
+    )
     parser.add_argument(
         "-i",
         "--install",
@@ -42,6 +80,13 @@ def get_args() -> Namespace:
     parser.add_argument(
         "-j", "--json", type=Path, metavar="file", help="log jobs as JSON when done"
     )
+    parser.add_argument(
+        "-J",
+        "--jsonl",
+        type=Path,
+        metavar="file",
+        help="stream jobs as JSON Lines as soon as they are done",
+    )
     parser.add_argument(
         "-k",
         "--keyring",
@@ -59,20 +104,159 @@ def get_args() -> Namespace:
         metavar="glob",
         help="globs of files to overwrite",
     )
+    parser.add_argument(
+        "--capture-limit",
+        type=int,
+        metavar="bytes",
+        default=64 * 1024,
+        help="bytes of each command's stdout and stderr to keep in the results",
+    )
+    parser.add_argument(
+        "--log-dir",
+        type=Path,
+        metavar="dir",
+        help="write the full output of each step to <dir>/<system>/<step>.std{out,err}",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="print the output of the systems line by line while it arrives",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="do not start further systems after the first one failed",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        metavar="file",
+        help="write step timings and run metrics as a Prometheus textfile",
+    )
+    parser.add_argument(
+        "--openmetrics",
+        action="store_true",
+        help="write the metrics in the OpenMetrics format",
+    )
+    parser.add_argument(
+        "--summary",
+        action="store_true",
+        help="print step latencies, slowest systems and throughput when done",
+    )
+    parser.add_argument(
+        "-M",
+        "--multiplex",
+        action="store_true",
+        help="reuse one SSH connection per system for all steps",
+    )
+    parser.add_argument(
+        "-r",
+        "--resume",
+        type=Path,
+        metavar="journal",
+        help="skip systems completed in the given JSON Lines journal and append to it",
+    )
+    parser.add_argument(
+        "-P",
+        "--probe",
+        action="store_true",
+        help="skip systems that do not accept SSH connections up front",
+    )
+    parser.add_argument(
+        "--probe-timeout",
+        type=float,
+        metavar="seconds",
+        default=3,
+        help="seconds to wait for the SSH port to accept connections",
+    )
     parser.add_argument(
         "-p",
         "--processes",
         type=int,
         metavar="n",
-        default=cpu_count(),
-        help="amount of parallel processes",
+        default=64,
+        help="amount of steps to run concurrently across all systems",
+    )
+    parser.add_argument(
+        "--in-flight",
+        type=int,
+        metavar="n",
+        help="amount of systems to have started at a time (default: 2 * processes)",
+    )
+    parser.add_argument(
+        "-l",
+        "--step-limit",
+        type=step_limit,
+        action="append",
+        default=[],
+        metavar="step=n",
+        help="limit the concurrency of a step, 0 meaning unlimited",
+    )
+    parser.add_argument(
+        "--retry",
+        type=retry_policy,
+        action="append",
+        default=[],
+        metavar="error=n[:seconds]",
+        help="retry steps failing with the given error class (connect, ssh, timeout,"
+        " dblock, other) up to n times, backing off from the given delay",
+    )
+    parser.add_argument(
+        "--retry-step",
+        action="append",
+        choices=STEPS,
+        default=[],
+        metavar="step",
+        help="also retry the given step on errors after which it may have run"
+        " partially, e.g. execute or rsync",
+    )
+    parser.add_argument(
+        "--fixed-limits",
+        action="store_true",
+        help="do not adapt step limits to step durations and failures",
     )
     parser.add_argument(
         "-q",
         "--chunk-size",
         type=int,
         metavar="n",
-        help="chunk size for multiprocessing",
+        help="ignored, kept for backwards compatibility",
+    )
+    parser.add_argument(
+        "--canary",
+        type=int,
+        metavar="n",
+        default=0,
+        help="process n systems as a first wave before any others",
+    )
+    waves = parser.add_mutually_exclusive_group()
+    waves.add_argument(
+        "--waves",
+        type=percentage,
+        nargs="+",
+        metavar="percent",
+        help="process the systems in waves up to the given cumulative percentages,"
+        " e.g. 1 10 50 100",
+    )
+    waves.add_argument(
+        "--group-waves",
+        action="store_true",
+        help="check the systems for pending updates first and process systems"
+        " with identical updates in the same wave",
+    )
+    parser.add_argument(
+        "--error-budget",
+        type=percentage,
+        metavar="percent",
+        default=5,
+        help="halt the rollout if more than this share of a wave's reachable"
+        " systems failed",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        metavar="system",
+        help="download packages once on this system and push them to all systems",
     )
     parser.add_argument("-s", "--shuffle", action="store_true", help="shuffle systems")
     parser.add_argument(
@@ -1,8 +1,19 @@
 """Common constants."""
 
 
-__all__ = ["PACMAN", "SYSTEMCTL"]
+__all__ = ["PACMAN", "STEPS", "SYSTEMCTL"]
 
 
 PACMAN = "/usr/bin/pacman"
+STEPS = (
+    "checkupdates",
+    "keyring",
+    "pkgcache",
+    "sysupgrade",
+    "cleanup",
+    "execute",
+    "facts",
+    "reboot",
+    "boot_id",
+)
 SYSTEMCTL = "/usr/bin/systemctl"
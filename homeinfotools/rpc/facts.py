@@ -0,0 +1,55 @@
+"""Gathering of facts about a remote system."""
+
+from argparse import Namespace
+from subprocess import TimeoutExpired
+
+from homeinfotools.exceptions import SSHConnectionError
+from homeinfotools.facts import COMMAND, parse_facts, store_facts
+from homeinfotools.functions import execute_step
+from homeinfotools.logging import syslogger
+from homeinfotools.ssh import ssh
+
+
+__all__ = ["facts"]
+
+
+async def facts(system: int, args: Namespace) -> dict:
+    """Gathers facts about the system in a single
+    round trip and stores them in the facts cache.
+    """
+
+    command = ssh(
+        system,
+        COMMAND,
+        user=args.user,
+        no_stdin=True,
+        control_path=args.control_path,
+    )
+    syslogger(system).debug("Gathering facts.")
+
+    try:
+        completed_process = await execute_step(
+            "facts", command, args, system=system, timeout=args.timeout, bounded=False
+        )
+    except TimeoutExpired as error:
+        syslogger(system).error("Gathering facts timed out.")
+        return {"timeout": error.timeout}
+
+    if completed_process.returncode == 255:
+        raise SSHConnectionError(completed_process)
+
+    if completed_process.returncode != 0:
+        syslogger(system).error("Could not gather facts.")
+        syslogger(system).debug("%s", completed_process.stderr)
+        return {
+            "returncode": completed_process.returncode,
+            "stderr": completed_process.stderr,
+        }
+
+    gathered = parse_facts(completed_process.stdout)
+    store_facts(args.facts_cache, system, gathered)
+    return {
+        "returncode": completed_process.returncode,
+        **{key: value for key, value in gathered.items() if key != "packages"},
+        "packages": len(gathered["packages"]),
+    }
@@ -1,19 +1,42 @@
 """Terminal batch updating utility."""
 
-from json import dump
+from argparse import Namespace
+from json import dumps
 from logging import basicConfig
-from multiprocessing import Manager, Pool
 from random import shuffle
 
+from homeinfotools.exceptions import PackageCacheError
 from homeinfotools.functions import get_log_level
-from homeinfotools.logging import LOG_FORMAT
+from homeinfotools.limiter import StepSlots, get_limiters
+from homeinfotools.logging import LOG_FORMAT, LOGGER
+from homeinfotools.metrics import get_run_metrics, report
+from homeinfotools.pool import process
+from homeinfotools.probe import probe
+from homeinfotools.retry import SAFE_STEPS, get_retry_policies
+from homeinfotools.results import completed_systems, failed, results_writer
+from homeinfotools.ssh import multiplexing
 from homeinfotools.rpc.argparse import get_args
+from homeinfotools.rpc.common import STEPS
+from homeinfotools.rpc.pkgcache import package_cache
+from homeinfotools.rpc.rollout import rollout
+from homeinfotools.rpc.updates import group_systems
 from homeinfotools.rpc.worker import Worker
 
 
 __all__ = ["main"]
 
 
+def print_update_groups(args: Namespace) -> None:
+    """Prints the checked systems grouped by identical
+    pending updates as JSON Lines, the largest group first.
+    """
+
+    groups = group_systems(sorted(args.pending_updates), args.pending_updates)
+
+    for updates, systems in sorted(groups.items(), key=lambda item: -len(item[1])):
+        print(dumps({"systems": systems, "updates": list(updates)}), flush=True)
+
+
 def main() -> int:
     """Runs the script."""
 
@@ -23,16 +46,61 @@ def main() -> int:
     if args.shuffle:
         shuffle(args.system)
 
-    results = Manager().dict()
+    args.limiters = get_limiters(args.step_limit, adaptive=not args.fixed_limits)
+    args.retry_policies = get_retry_policies(args.retry)
+    args.retry_steps = SAFE_STEPS.union(args.retry_step)
+    args.slots = StepSlots(args.processes, STEPS)
+    args.in_flight = args.in_flight or 2 * args.processes
+    args.not_back_online = []
+    args.pending_updates = {}
+    args.synced_databases = set()
+    args.run_metrics = get_run_metrics(args, "sysrpc")
+
+    if args.resume is not None:
+        completed = completed_systems(args.resume)
+        pending = [system for system in args.system if system not in completed]
+        LOGGER.info("Skipping %i completed systems.", len(args.system) - len(pending))
+        args.system = pending
+        args.jsonl = args.resume
+
+    with results_writer(
+        args.jsonl, args.json, append=args.resume is not None
+    ) as results:
+        worker = Worker(args, results)
+
+        try:
+            if args.probe:
+                args.system, offline = probe(args.system, timeout=args.probe_timeout)
+
+                for system in offline:
+                    worker.skip_offline(system)
+
+            with multiplexing(args), package_cache(args):
+                if args.canary or args.waves or args.group_waves:
+                    if not rollout(worker, args.system):
+                        return 1
+                else:
+                    process(
+                        worker,
+                        args.system,
+                        concurrency=args.in_flight,
+                        until=failed if args.fail_fast else None,
+                    )
+        except KeyboardInterrupt:
+            return 1
+        except PackageCacheError as error:
+            LOGGER.error("%s", error)
+            return 2
+        finally:
+            report(args)
 
-    try:
-        with Pool(args.processes) as pool:
-            pool.map(Worker(args, results), args.system, chunksize=args.chunk_size)
-    except KeyboardInterrupt:
-        return 1
+            if args.not_back_online:
+                LOGGER.error(
+                    "Systems not back online after reboot: %s",
+                    ", ".join(map(str, sorted(args.not_back_online))),
+                )
 
-    if args.json is not None:
-        with args.json.open("w") as file:
-            dump(dict(results), file, indent=2)
+            if args.check_updates:
+                print_update_groups(args)
 
     return 0
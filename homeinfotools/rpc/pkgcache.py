@@ -0,0 +1,139 @@
+"""Distribution of a shared package cache.
+
+The packages required for an upgrade are downloaded once on a seed
+system, staged locally and pushed into the package cache of every
+system, along with the seed's sync databases. The systems can then
+upgrade via "pacman -Su" without downloading from the mirrors.
+"""
+
+from argparse import Namespace
+from asyncio import run
+from contextlib import contextmanager
+from pathlib import Path
+from subprocess import CompletedProcess, TimeoutExpired
+from tempfile import TemporaryDirectory
+from typing import Iterator
+
+from homeinfotools.exceptions import PackageCacheError
+from homeinfotools.functions import execute, execute_step
+from homeinfotools.logging import LOGGER, syslogger
+from homeinfotools.rpc.common import PACMAN
+from homeinfotools.rpc.sudo import sudo
+from homeinfotools.ssh import rsync, ssh
+
+
+__all__ = ["package_cache", "push_databases", "push_packages"]
+
+
+CACHE_DIR = "/var/cache/pacman/pkg/"
+SYNC_DIR = "/var/lib/pacman/sync/"
+SEED_CACHE_DIR = "/tmp/homeinfotools-pkgcache/"
+SUDO_RSYNC = "/usr/bin/sudo /usr/bin/rsync"
+
+
+async def download_packages(args: Namespace) -> CompletedProcess:
+    """Downloads the packages required for an upgrade on the seed system."""
+
+    command = [PACMAN, "-Syuw", "--noconfirm", "--cachedir", SEED_CACHE_DIR]
+    command.extend(args.install)
+    command = ssh(
+        args.seed,
+        *sudo(*command),
+        user=args.user,
+        no_stdin=args.no_stdin,
+    )
+    syslogger(args.seed).debug("Executing command: %s", command)
+    return await execute(command, timeout=args.timeout)
+
+
+async def stage(args: Namespace, src: str, dst: Path) -> CompletedProcess:
+    """Fetches a directory from the seed system."""
+
+    command = rsync(
+        (args.seed, src),
+        f"{dst}/",
+        all=False,
+        update=False,
+        user=args.user,
+        options=["-rt"],
+    )
+    syslogger(args.seed).debug("Executing command: %s", command)
+    return await execute(command, timeout=args.timeout)
+
+
+async def prepare(args: Namespace, staging: Path) -> None:
+    """Prepares the local staging directory.
+
+    Raises PackageCacheError if any step fails or times out.
+    """
+
+    LOGGER.info("Downloading packages on seed system %i.", args.seed)
+
+    try:
+        check(await download_packages(args))
+        check(await stage(args, SEED_CACHE_DIR, staging / "pkg"))
+        check(await stage(args, SYNC_DIR, staging / "sync"))
+    except TimeoutExpired:
+        raise PackageCacheError(
+            "Preparing package cache on seed system timed out."
+        ) from None
+
+
+def check(completed_process: CompletedProcess) -> None:
+    """Checks whether a step of the preparation succeeded."""
+
+    if completed_process.returncode != 0:
+        LOGGER.debug("%s", completed_process.stderr)
+        raise PackageCacheError("Could not prepare package cache on seed system.")
+
+
+@contextmanager
+def package_cache(args: Namespace) -> Iterator[Path | None]:
+    """Provides a staged package cache from the seed system, if requested."""
+
+    if args.seed is None or not args.sysupgrade:
+        args.package_cache = None
+        yield None
+        return
+
+    with TemporaryDirectory() as tmpd:
+        (staging := Path(tmpd)).joinpath("pkg").mkdir()
+        staging.joinpath("sync").mkdir()
+        run(prepare(args, staging))
+        args.package_cache = staging
+
+        try:
+            yield staging
+        finally:
+            args.package_cache = None
+
+
+async def push(system: int, src: Path, dst: str, args: Namespace) -> CompletedProcess:
+    """Pushes a staged directory onto the system."""
+
+    command = rsync(
+        f"{src}/",
+        (system, dst),
+        all=False,
+        update=False,
+        user=args.user,
+        control_path=args.control_path,
+        rsync_path=SUDO_RSYNC,
+        options=["-rt"],
+    )
+    syslogger(system).debug("Executing command: %s", command)
+    return await execute_step(
+        "pkgcache", command, args, system=system, timeout=args.timeout
+    )
+
+
+async def push_packages(system: int, args: Namespace) -> CompletedProcess:
+    """Pushes the staged packages into the system's package cache."""
+
+    return await push(system, args.package_cache / "pkg", CACHE_DIR, args)
+
+
+async def push_databases(system: int, args: Namespace) -> CompletedProcess:
+    """Pushes the staged sync databases onto the system."""
+
+    return await push(system, args.package_cache / "sync", SYNC_DIR, args)
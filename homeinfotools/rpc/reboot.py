@@ -1,10 +1,16 @@
 """Reboots a system."""
 
 from argparse import Namespace
+from asyncio import sleep
+from subprocess import TimeoutExpired
+from time import monotonic
 
 from homeinfotools.exceptions import SSHConnectionError
-from homeinfotools.functions import completed_process_to_json, execute
+from homeinfotools.functions import completed_process_to_json, execute_step
 from homeinfotools.logging import syslogger
+from homeinfotools.metrics import timed
+from homeinfotools.pool import release_in_flight
+from homeinfotools.probe import is_reachable
 from homeinfotools.rpc.common import SYSTEMCTL
 from homeinfotools.rpc.sudo import sudo
 from homeinfotools.ssh import ssh
@@ -13,14 +19,26 @@ from homeinfotools.ssh import ssh
 __all__ = ["reboot"]
 
 
-def reboot(system: int, args: Namespace) -> dict:
+BOOT_ID = "/proc/sys/kernel/random/boot_id"
+INITIAL_DELAY = 2
+MAX_DELAY = 30
+
+
+async def reboot(system: int, args: Namespace) -> dict:
     """Reboots a system."""
 
+    boot_id = await get_boot_id(system, args) if args.wait_online else None
     command = ssh(
-        system, *sudo(SYSTEMCTL, "reboot"), user=args.user, no_stdin=args.no_stdin
+        system,
+        *sudo(SYSTEMCTL, "reboot"),
+        user=args.user,
+        no_stdin=args.no_stdin,
+        control_path=args.control_path,
     )
     syslogger(system).debug("Rebooting system %i.", system)
-    completed_process = execute(command)
+    completed_process = await execute_step(
+        "reboot", command, args, system=system, success={0, 1}, retry=False
+    )
 
     if completed_process.returncode == 0:
         syslogger(system).info("System %i is rebooting.", system)
@@ -29,4 +47,94 @@ def reboot(system: int, args: Namespace) -> dict:
     elif completed_process.returncode == 255:
         raise SSHConnectionError(completed_process)
 
-    return completed_process_to_json(completed_process)
+    result = completed_process_to_json(completed_process)
+
+    if args.wait_online:
+        result["back_online"] = await wait_online(system, boot_id, args)
+
+    return result
+
+
+async def get_boot_id(
+    system: int, args: Namespace, *, control_path: bool = True
+) -> str | None:
+    """Returns the system's current boot ID or None if it is not reachable
+    or does not respond in time.
+    """
+
+    command = ssh(
+        system,
+        "cat",
+        BOOT_ID,
+        user=args.user,
+        no_stdin=True,
+        control_path=args.control_path if control_path else None,
+    )
+
+    try:
+        # Waiting for the system to be back online polls on its own.
+        completed_process = await execute_step(
+            "boot_id",
+            command,
+            args,
+            system=system,
+            timeout=args.probe_timeout + 10,
+            retry=False,
+        )
+    except TimeoutExpired:
+        return None
+
+    if completed_process.returncode == 255 and control_path:
+        raise SSHConnectionError(completed_process)
+
+    if completed_process.returncode != 0:
+        return None
+
+    return completed_process.stdout.strip()
+
+
+async def wait_online(
+    system: int, boot_id: str | None, args: Namespace
+) -> float | None:
+    """Waits for the system to be back online after a reboot.
+
+    Polls with exponential back-off until the SSH port accepts connections
+    and the system reports a new boot ID, or until the system's deadline,
+    counted from its own reboot, passes. Meanwhile, the system does not
+    take up a place among the systems in flight.
+    If the boot ID before the reboot is unknown, the system must have been
+    unreachable at least once before any boot ID is accepted.
+    Returns the seconds it took or None if it did not come back in time.
+    """
+
+    release_in_flight()
+    start = monotonic()
+    deadline = start + args.wait_online
+    delay = INITIAL_DELAY
+    went_down = False
+
+    with timed("back_online"):
+        while (remaining := deadline - monotonic()) > 0:
+            await sleep(min(delay, remaining))
+            delay = min(delay * 2, MAX_DELAY)
+
+            if not await is_reachable(system, timeout=args.probe_timeout):
+                went_down = True
+                continue
+
+            if boot_id is None and not went_down:
+                continue
+
+            # The old master connection died with the reboot.
+            current = await get_boot_id(system, args, control_path=False)
+
+            if current is not None and current != boot_id:
+                seconds = round(monotonic() - start, 1)
+                syslogger(system).info("Back online after %.1f seconds.", seconds)
+                return seconds
+
+    syslogger(system).error(
+        "Not back online within %i seconds after reboot.", args.wait_online
+    )
+    args.not_back_online.append(system)
+    return None
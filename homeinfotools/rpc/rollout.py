@@ -0,0 +1,157 @@
+"""Staged rollout of changes to the systems.
+
+The systems are processed in waves of growing size, starting with an
+optional canary batch. Before the next wave is started, the share of
+reachable systems of the current wave that failed is compared to the
+error budget and the rollout halts if it is exceeded.
+
+Alternatively, the systems are checked for pending updates up front and
+systems with identical updates are processed in the same wave.
+"""
+
+from argparse import ArgumentTypeError, Namespace
+from asyncio import run
+from math import ceil
+from typing import Iterator, Sequence
+
+from homeinfotools.exceptions import SSHConnectionError
+from homeinfotools.logging import LOGGER, syslogger
+from homeinfotools.pool import map_async
+from homeinfotools.results import OFFLINE, failed
+from homeinfotools.rpc.updates import check_updates, group_systems
+from homeinfotools.rpc.worker import Worker
+
+
+__all__ = ["percentage", "rollout"]
+
+
+def percentage(string: str) -> float:
+    """Parses a percentage of systems."""
+
+    try:
+        value = float(string.rstrip("%"))
+    except ValueError:
+        raise ArgumentTypeError(f"Invalid percentage: {string}") from None
+
+    if not 0 <= value <= 100:
+        raise ArgumentTypeError(f"Percentage out of range: {string}")
+
+    return value
+
+
+def get_waves(
+    systems: Sequence[int], *, canary: int, percentages: Sequence[float]
+) -> Iterator[list[int]]:
+    """Yields the waves of systems.
+
+    The percentages are cumulative shares of all systems.
+    The last wave contains all remaining systems.
+    """
+
+    start = min(canary, len(systems))
+
+    if start:
+        yield list(systems[:start])
+
+    for percent in sorted(percentages):
+        if (end := ceil(len(systems) * percent / 100)) > start:
+            yield list(systems[start:end])
+            start = end
+
+    if start < len(systems):
+        yield list(systems[start:])
+
+
+async def get_update_waves(
+    systems: Sequence[int], args: Namespace
+) -> list[list[int]]:
+    """Checks the systems for pending updates and returns the waves of
+    systems with identical updates, the smallest first, following the
+    canary wave. Systems whose updates are unknown form the last wave.
+    """
+
+    canary, systems = list(systems[: args.canary]), systems[args.canary :]
+
+    async def check(system: int) -> None:
+        try:
+            await check_updates(system, args)
+        except SSHConnectionError:
+            syslogger(system).warning("Could not establish SSH connection.")
+
+    LOGGER.info("Checking %i systems for pending updates.", len(systems))
+    await map_async(check, systems, concurrency=args.in_flight)
+    groups = group_systems(systems, args.pending_updates)
+    unknown = groups.pop(None, [])
+    LOGGER.info("Found %i distinct sets of pending updates.", len(groups))
+    waves = [canary] if canary else []
+    waves.extend(sorted(groups.values(), key=len))
+
+    if unknown:
+        waves.append(unknown)
+
+    return waves
+
+
+def error_rate(results: list[dict]) -> float:
+    """Returns the share of reachable systems that failed."""
+
+    if not (reachable := [r for r in results if r["status"] != OFFLINE]):
+        return 0
+
+    return sum(map(failed, reachable)) / len(reachable)
+
+
+async def rollout_waves(worker: Worker, systems: Sequence[int]) -> bool:
+    """Processes the systems in waves.
+
+    Returns True if all waves were processed and False if the rollout halted.
+    """
+
+    args = worker.args
+
+    if args.group_waves:
+        waves = await get_update_waves(systems, args)
+    else:
+        waves = list(
+            get_waves(systems, canary=args.canary, percentages=args.waves or [100])
+        )
+
+    for number, wave in enumerate(waves, start=1):
+        results = []
+
+        async def process(system: int) -> dict:
+            results.append(result := await worker(system))
+            return result
+
+        LOGGER.info(
+            "Starting wave %i/%i with %i systems.", number, len(waves), len(wave)
+        )
+        await map_async(
+            process,
+            wave,
+            concurrency=args.in_flight,
+            until=failed if args.fail_fast else None,
+        )
+        rate = error_rate(results) * 100
+        LOGGER.info("Wave %i failed on %.1f%% of the systems.", number, rate)
+
+        # A wave that was cut short by --fail-fast halts the rollout as well.
+        if rate > args.error_budget or len(results) < len(wave):
+            pending = sum(map(len, waves[number:])) + len(wave) - len(results)
+            LOGGER.error(
+                "Halting after wave %i (%.1f%% failed, error budget %.1f%%)."
+                " %i systems were not processed.",
+                number,
+                rate,
+                args.error_budget,
+                pending,
+            )
+            return False
+
+    return True
+
+
+def rollout(worker: Worker, systems: Sequence[int]) -> bool:
+    """Runs the event loop to process the systems in waves."""
+
+    return run(rollout_waves(worker, systems))
@@ -4,30 +4,37 @@ from argparse import Namespace
 
 from homeinfotools.exceptions import SSHConnectionError
 from homeinfotools.logging import syslogger
-from homeinfotools.functions import completed_process_to_json, execute
+from homeinfotools.functions import completed_process_to_json, execute_step
 from homeinfotools.ssh import ssh
 
 
 __all__ = ["runcmd"]
 
 
-def runcmd(system: int, args: Namespace) -> dict:
+async def runcmd(system: int, args: Namespace) -> dict:
     """Runs commands on a remote system."""
 
-    command = ssh(system, args.execute, user=args.user, no_stdin=args.no_stdin)
+    command = ssh(
+        system,
+        args.execute,
+        user=args.user,
+        no_stdin=args.no_stdin,
+        control_path=args.control_path,
+    )
     syslogger(system).debug('Running "%s" on system.', args.execute)
-    completed_process = execute(command)
+    completed_process = await execute_step("execute", command, args, system=system)
 
     if completed_process.returncode == 255:
         raise SSHConnectionError(completed_process)
 
     syslogger(system).debug("Returncode: %i", completed_process.returncode)
 
-    if stdout := completed_process.stdout:
-        syslogger(system).info(stdout.strip())
+    if not args.stream:
+        if stdout := completed_process.stdout:
+            syslogger(system).info(stdout.strip())
 
-    if stderr := completed_process.stderr:
-        syslogger(system).warning(stderr.strip())
+        if stderr := completed_process.stderr:
+            syslogger(system).warning(stderr.strip())
 
     if not completed_process.returncode == 0:
         syslogger(system).error("Command failed.")
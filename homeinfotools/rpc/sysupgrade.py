@@ -4,13 +4,15 @@ from argparse import Namespace
 from subprocess import TimeoutExpired, CompletedProcess
 
 from homeinfotools.exceptions import SSHConnectionError
-from homeinfotools.functions import completed_process_to_json, execute
+from homeinfotools.functions import completed_process_to_json, execute_step
 from homeinfotools.logging import syslogger
 from homeinfotools.rpc.common import PACMAN
 from homeinfotools.rpc.exceptions import PacmanError
 from homeinfotools.rpc.exceptions import SystemIOError
 from homeinfotools.rpc.exceptions import UnknownError
+from homeinfotools.rpc.pkgcache import push_databases, push_packages
 from homeinfotools.rpc.sudo import sudo
+from homeinfotools.rpc.updates import check_updates
 from homeinfotools.ssh import ssh
 from homeinfotools.systemd import systemd_inhibit
 
@@ -36,7 +38,7 @@ def lograise(system: int, message: str, completed_process: CompletedProcess) ->
     raise UnknownError(completed_process)
 
 
-def upgrade_keyring(system: int, args: Namespace) -> CompletedProcess:
+async def upgrade_keyring(system: int, args: Namespace) -> CompletedProcess:
     """Upgrades the archlinux-keyring on that system."""
 
     command = systemd_inhibit(
@@ -50,17 +52,26 @@ def upgrade_keyring(system: int, args: Namespace) -> CompletedProcess:
         why="keyring-upgrade",
     )
     command = sudo(*command)
-    command = ssh(system, *command, user=args.user, no_stdin=args.no_stdin)
+    command = ssh(
+        system,
+        *command,
+        user=args.user,
+        no_stdin=args.no_stdin,
+        control_path=args.control_path,
+    )
     syslogger(system).debug("Executing command: %s", command)
-    return execute(command, timeout=args.timeout)
+    return await execute_step(
+        "keyring", command, args, system=system, timeout=args.timeout
+    )
 
 
-def upgrade_system(system: int, args: Namespace) -> CompletedProcess:
+async def upgrade_system(system: int, args: Namespace) -> CompletedProcess:
     """Upgrades the system."""
 
     command = systemd_inhibit(
         PACMAN,
-        "-Syu",
+        # Sync databases have been pushed along with a shared package cache.
+        "-Syu" if args.package_cache is None else "-Su",
         "--needed",
         "--disable-download-timeout",
         who="pacman",
@@ -82,12 +93,20 @@ def upgrade_system(system: int, args: Namespace) -> CompletedProcess:
     if args.yes:
         command = f"yes | {command}"
 
-    command = ssh(system, command, user=args.user, no_stdin=args.no_stdin)
+    command = ssh(
+        system,
+        command,
+        user=args.user,
+        no_stdin=args.no_stdin,
+        control_path=args.control_path,
+    )
     syslogger(system).debug("Executing command: %s", command)
-    return execute(command, timeout=args.timeout)
+    return await execute_step(
+        "sysupgrade", command, args, system=system, timeout=args.timeout
+    )
 
 
-def cleanup_system(system: int, args: Namespace) -> CompletedProcess:
+async def cleanup_system(system: int, args: Namespace) -> CompletedProcess:
     """Cleans up the system."""
 
     command = systemd_inhibit(
@@ -106,32 +125,66 @@ def cleanup_system(system: int, args: Namespace) -> CompletedProcess:
     if args.yes:
         command = f"yes | {command}"
 
-    command = ssh(system, command, user=args.user, no_stdin=args.no_stdin)
+    command = ssh(
+        system,
+        command,
+        user=args.user,
+        no_stdin=args.no_stdin,
+        control_path=args.control_path,
+    )
     syslogger(system).debug("Executing command: %s", command)
-    return execute(command, timeout=args.timeout)
+    return await execute_step(
+        "cleanup", command, args, system=system, timeout=args.timeout, success={0, 1}
+    )
 
 
-def upgrade(system: int, args: Namespace) -> dict:
+async def upgrade(system: int, args: Namespace) -> dict:
     """Upgrade process function."""
 
-    syslogger(system).info("Upgrading system.")
     result = {}
 
+    if args.skip_current:
+        # Reuse the updates of a preceding check, e.g. of grouped waves.
+        if (updates := args.pending_updates.get(system)) is None:
+            result["updates"] = await check_updates(system, args)
+            updates = result["updates"]["updates"]
+
+        if updates == [] and not args.install:
+            syslogger(system).info("System is up to date.")
+            return {**result, "current": True}
+
+    syslogger(system).info("Upgrading system.")
+
     if args.keyring:
-        completed_process = upgrade_keyring(system, args=args)
+        completed_process = await upgrade_keyring(system, args=args)
         result["keyring"] = completed_process_to_json(completed_process)
 
         if completed_process.returncode != 0:
             lograise(system, "Could not update keyring.", completed_process)
 
-    completed_process = upgrade_system(system, args=args)
+    if args.package_cache is not None:
+        completed_process = await push_packages(system, args)
+        result["pkgcache"] = completed_process_to_json(completed_process)
+
+        if completed_process.returncode != 0:
+            lograise(system, "Could not push packages.", completed_process)
+
+        # The sync databases may have been pushed to check for updates.
+        if system not in args.synced_databases:
+            completed_process = await push_databases(system, args)
+            result["syncdb"] = completed_process_to_json(completed_process)
+
+            if completed_process.returncode != 0:
+                lograise(system, "Could not push sync databases.", completed_process)
+
+    completed_process = await upgrade_system(system, args=args)
     result["sysupgrade"] = completed_process_to_json(completed_process)
 
     if completed_process.returncode != 0:
         lograise(system, "Could not upgrade system.", completed_process)
 
     if args.cleanup:
-        completed_process = cleanup_system(system, args=args)
+        completed_process = await cleanup_system(system, args=args)
         result["pkgcleanup"] = completed_process_to_json(completed_process)
 
         if completed_process.returncode not in {0, 1}:
@@ -140,15 +193,15 @@ def upgrade(system: int, args: Namespace) -> dict:
     return result
 
 
-def sysupgrade(system: int, args: Namespace) -> dict:
+async def sysupgrade(system: int, args: Namespace) -> dict:
     """Upgrades the respective system."""
 
     try:
-        return upgrade(system, args)
+        return await upgrade(system, args)
     except SystemIOError as error:
         syslogger(system).error("I/O error.")
         syslogger(system).debug("%s", error)
-        return completed_process_to_json(error.completed_process)
+        return {**completed_process_to_json(error.completed_process), "error": "io"}
     except TimeoutExpired as error:
         syslogger(system).error("Subprocess timed out after %s seconds.", error.timeout)
         syslogger(system).debug("%s", error)
@@ -156,8 +209,14 @@ def sysupgrade(system: int, args: Namespace) -> dict:
     except PacmanError as error:
         syslogger(system).error("Pacman error.")
         syslogger(system).debug("%s", error)
-        return completed_process_to_json(error.completed_process)
+        return {
+            **completed_process_to_json(error.completed_process),
+            "error": "pacman",
+        }
     except UnknownError as error:
         syslogger(system).error("Unknown error.")
         syslogger(system).debug("%s", error)
-        return completed_process_to_json(error.completed_process)
+        return {
+            **completed_process_to_json(error.completed_process),
+            "error": "unknown",
+        }
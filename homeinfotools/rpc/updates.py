@@ -0,0 +1,137 @@
+"""Checking of pending updates.
+
+The pending updates of a system are determined via checkupdates, which
+syncs the databases into a temporary directory and does not modify the
+system. If sync databases are pushed from a seed system, "pacman -Qu"
+is run against them instead. Systems with identical pending updates are
+grouped, so that they can be upgraded together.
+"""
+
+from argparse import Namespace
+from collections import defaultdict
+from subprocess import TimeoutExpired
+from typing import Iterable, Mapping, Sequence
+
+from homeinfotools.exceptions import SSHConnectionError
+from homeinfotools.functions import execute_step
+from homeinfotools.logging import syslogger
+from homeinfotools.rpc.common import PACMAN
+from homeinfotools.rpc.pkgcache import push_databases
+from homeinfotools.ssh import ssh
+
+
+__all__ = ["check_updates", "group_systems", "parse_updates"]
+
+
+CHECKUPDATES = "/usr/bin/checkupdates"
+
+
+def parse_updates(text: str) -> list[str]:
+    """Parses the "<name> <old> -> <new>" lines of pending
+    updates, skipping packages ignored by pacman.
+    """
+
+    return sorted(
+        line
+        for line in map(str.strip, text.splitlines())
+        if line and not line.endswith("[ignored]")
+    )
+
+
+async def check_updates(system: int, args: Namespace) -> dict:
+    """Determines the pending updates of the system and records them
+    in the args. The updates are None if they could not be determined.
+
+    Systems whose sync databases were pushed are recorded in the args
+    as well, so that the upgrade need not push them again.
+    """
+
+    if args.package_cache is None:
+        # checkupdates exits with 2 if there are no pending updates.
+        command, current = [CHECKUPDATES], 2
+    else:
+        try:
+            completed_process = await push_databases(system, args)
+        except TimeoutExpired as error:
+            syslogger(system).warning("Pushing sync databases timed out.")
+            return {"timeout": error.timeout, "updates": None}
+
+        if completed_process.returncode == 255:
+            raise SSHConnectionError(completed_process)
+
+        if completed_process.returncode != 0:
+            syslogger(system).warning("Could not push sync databases.")
+            return {
+                "returncode": completed_process.returncode,
+                "stderr": completed_process.stderr,
+                "updates": None,
+            }
+
+        args.synced_databases.add(system)
+        # pacman -Qu exits with 1 if there are no pending updates.
+        command, current = [PACMAN, "-Qu"], 1
+
+    command = ssh(
+        system,
+        *command,
+        user=args.user,
+        no_stdin=True,
+        control_path=args.control_path,
+    )
+    syslogger(system).debug("Checking for updates.")
+
+    try:
+        completed_process = await execute_step(
+            "checkupdates",
+            command,
+            args,
+            system=system,
+            timeout=args.timeout,
+            success={0, current},
+            bounded=False,
+        )
+    except TimeoutExpired as error:
+        syslogger(system).warning("Checking for updates timed out.")
+        return {"timeout": error.timeout, "updates": None}
+
+    if completed_process.returncode == 255:
+        raise SSHConnectionError(completed_process)
+
+    if completed_process.returncode == 0:
+        updates = parse_updates(completed_process.stdout)
+    elif (
+        completed_process.returncode == current
+        and not completed_process.stdout.strip()
+        and "error:" not in completed_process.stderr
+    ):
+        updates = []
+    else:
+        syslogger(system).warning("Could not check for updates.")
+        syslogger(system).debug("%s", completed_process.stderr)
+        updates = None
+
+    if updates is not None:
+        args.pending_updates[system] = updates
+
+    return {
+        "returncode": completed_process.returncode,
+        "stderr": completed_process.stderr,
+        "updates": updates,
+    }
+
+
+def group_systems(
+    systems: Iterable[int], updates: Mapping[int, Sequence[str] | None]
+) -> dict[tuple[str, ...] | None, list[int]]:
+    """Groups the systems by identical pending updates.
+
+    Systems whose updates are unknown are grouped under None.
+    """
+
+    groups = defaultdict(list)
+
+    for system in systems:
+        pending = updates.get(system)
+        groups[None if pending is None else tuple(pending)].append(system)
+
+    return groups
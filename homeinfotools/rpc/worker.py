@@ -1,28 +1,75 @@
 """Processing of systems."""
 
+from homeinfotools.rpc.facts import facts
 from homeinfotools.rpc.reboot import reboot
 from homeinfotools.rpc.runcmd import runcmd
+from homeinfotools.results import DONE, FAILED, OFFLINE, TIMEOUT
 from homeinfotools.rpc.sysupgrade import sysupgrade
+from homeinfotools.rpc.updates import check_updates
 from homeinfotools.worker import BaseWorker
 
 
-__all__ = ["Worker"]
+__all__ = ["NOT_BACK_ONLINE", "Worker"]
+
+
+NOT_BACK_ONLINE = "not back online"
 
 
 class Worker(BaseWorker):
-    """Stored args and manager to process systems."""
+    """Stored args and results to process systems."""
 
-    def run(self, system: int) -> dict:
+    async def run(self, system: int) -> dict:
         """Runs the worker."""
         result = {}
 
+        if self.args.check_updates:
+            result["updates"] = await check_updates(system, self.args)
+
         if self.args.sysupgrade:
-            result["sysupgrade"] = sysupgrade(system, self.args)
+            result["sysupgrade"] = await sysupgrade(system, self.args)
 
         if self.args.execute:
-            result["execute"] = runcmd(system, self.args)
+            result["execute"] = await runcmd(system, self.args)
+
+        if self.args.facts:
+            result["facts"] = await facts(system, self.args)
 
         if self.args.reboot:
-            result["reboot"] = reboot(system, self.args)
+            result["reboot"] = await reboot(system, self.args)
 
         return result
+
+    def get_status(self, result: dict) -> str:
+        """Returns the journal status of a processed system."""
+        if not result["online"]:
+            return OFFLINE
+
+        steps = result["result"]
+        sysupgrade_result = steps.get("sysupgrade", {})
+
+        if "timeout" in sysupgrade_result:
+            return TIMEOUT
+
+        if error := sysupgrade_result.get("error"):
+            return f"{error} error"
+
+        if "updates" in steps and steps["updates"]["updates"] is None:
+            return FAILED
+
+        if steps.get("execute", {}).get("returncode", 0) != 0:
+            return FAILED
+
+        if "timeout" in steps.get("facts", {}):
+            return TIMEOUT
+
+        if steps.get("facts", {}).get("returncode", 0) != 0:
+            return FAILED
+
+        if steps.get("reboot", {}).get("returncode", 0) not in {0, 1}:
+            return FAILED
+
+        if "back_online" in (reboot := steps.get("reboot", {})):
+            if reboot["back_online"] is None:
+                return NOT_BACK_ONLINE
+
+        return DONE
@@ -1,11 +1,27 @@
 """SSH command."""
 
+from argparse import Namespace
+from asyncio import create_subprocess_exec
+from contextlib import contextmanager
 from pathlib import Path
+from shlex import join
+from subprocess import DEVNULL, CompletedProcess
+from tempfile import TemporaryDirectory
+from typing import Iterable, Iterator
 
+from homeinfotools.exceptions import SSHConnectionError
 from homeinfotools.os import SSH, RSYNC
+from homeinfotools.retry import MAX_DELAY
 
 
-__all__ = ["ssh", "rsync"]
+__all__ = [
+    "ssh",
+    "rsync",
+    "relay",
+    "multiplexing",
+    "open_master",
+    "close_master",
+]
 
 
 HOSTNAME = "{}.terminals.homeinfo.intra"
@@ -15,12 +31,25 @@ SSH_OPTIONS = [
     "StrictHostKeyChecking=no",
     "ConnectTimeout=5",
 ]
+# Masters are closed explicitly, but may be idle while systems wait for step
+# slots or back off before retries. Should the process be killed, they exit
+# once idle for longer. Commands connect directly if their master is gone.
+CONTROL_PERSIST = 10 * 60
+# Lets masters notice unresponsive systems, e.g. while they reboot.
+KEEPALIVE_OPTIONS = ["ServerAliveInterval=15", "ServerAliveCountMax=3"]
 TRUE = "/usr/bin/true"
-HostPath = Path | tuple[int, Path]
+REMOTE_SSH = "/usr/bin/ssh"
+REMOTE_RSYNC = "/usr/bin/rsync"
+HostPath = str | Path | tuple[int, str | Path]
 
 
 def ssh(
-    system: int | None, *command: str, user: str | None = None, no_stdin: bool = False
+    system: int | None,
+    *command: str,
+    user: str | None = None,
+    no_stdin: bool = False,
+    control_path: Path | None = None,
+    forward_agent: bool = False,
 ) -> list[str]:
     """Modifies the specified command to
     run via SSH on the specified system.
@@ -31,17 +60,15 @@ def ssh(
     if no_stdin:
         cmd.append("-n")
 
-    for option in SSH_OPTIONS:
+    if forward_agent:
+        cmd.append("-A")
+
+    for option in get_ssh_options(control_path=control_path):
         cmd.append("-o")
         cmd.append(option)
 
     if system is not None:
-        hostname = HOSTNAME.format(system)
-
-        if user is not None:
-            hostname = f"{user}@{hostname}"
-
-        cmd.append(hostname)
+        cmd.append(get_hostname(system, user=user))
 
     if command:
         cmd.append(" ".join(command))
@@ -50,17 +77,20 @@ def ssh(
 
 
 def rsync(
-    src: HostPath,
+    src: HostPath | list[HostPath],
     dst: HostPath,
     *,
     all: bool = True,
     update: bool = True,
     user: str | None = None,
     verbose: bool = True,
+    control_path: Path | None = None,
+    rsync_path: str | None = None,
+    options: Iterable[str] = (),
 ) -> list[str]:
     """Returns the respective rsync command."""
 
-    cmd = [RSYNC, "-e", " ".join(ssh(None))]
+    cmd = [RSYNC, "-e", " ".join(ssh(None, control_path=control_path))]
 
     if all:
         cmd.append("-a")
@@ -71,17 +101,162 @@ def rsync(
     if verbose:
         cmd.append("-v")
 
-    return [*cmd, get_remote_path(src, user=user), get_remote_path(dst, user=user)]
+    if rsync_path is not None:
+        cmd.append(f"--rsync-path={rsync_path}")
+
+    cmd.extend(options)
+
+    for path in src if isinstance(src, list) else [src]:
+        cmd.append(get_remote_path(path, user=user))
+
+    return [*cmd, get_remote_path(dst, user=user)]
+
+
+def relay(
+    source: int,
+    target: int,
+    path: str | Path,
+    *,
+    user: str | None = None,
+    control_path: Path | None = None,
+    options: Iterable[str] = (),
+) -> list[str]:
+    """Returns a command that makes the source system
+    send its copy of the given file to the target system.
+    """
+
+    remote_command = [
+        REMOTE_RSYNC,
+        "-e",
+        " ".join([REMOTE_SSH, *_options(*SSH_OPTIONS)]),
+        "-a",
+        "-u",
+        "-v",
+        *options,
+        str(path),
+        get_remote_path((target, path), user=user),
+    ]
+    return ssh(
+        source,
+        join(remote_command),
+        user=user,
+        control_path=control_path,
+        forward_agent=True,
+    )
+
+
+def get_ssh_options(*, control_path: Path | None = None) -> list[str]:
+    """Returns the SSH options, optionally using a control master."""
+
+    if control_path is None:
+        return SSH_OPTIONS
+
+    return [*SSH_OPTIONS, "ControlMaster=no", f"ControlPath={control_path}"]
+
+
+def get_hostname(system: int, *, user: str | None = None) -> str:
+    """Returns the hostname of the given system."""
+
+    hostname = HOSTNAME.format(system)
+    return hostname if user is None else f"{user}@{hostname}"
 
 
 def get_remote_path(path: HostPath, *, user: str | None = None) -> str:
     """Returns a host path."""
 
-    try:
-        system, path = path
-    except TypeError:
-        return path
+    if not isinstance(path, tuple):
+        return str(path)
+
+    system, path = path
 
     return ":".join(
         [HOSTNAME.format(system if user is None else f"{user}@{system}"), str(path)]
     )
+
+
+@contextmanager
+def multiplexing(args: Namespace) -> Iterator[Path | None]:
+    """Provides a control path for SSH connection multiplexing
+    to the args for the duration of the job, if requested.
+    """
+
+    if not args.multiplex:
+        args.control_path = None
+        yield None
+        return
+
+    with TemporaryDirectory(prefix="hit-") as tmpd:
+        args.control_path = Path(tmpd) / "%C"
+        args.control_persist = control_persist(args)
+
+        try:
+            yield args.control_path
+        finally:
+            args.control_path = None
+
+
+def control_persist(args: Namespace) -> int:
+    """Returns the seconds an idle master connection persists: a step's
+    timeout, during which systems may wait for a step slot, plus the longest
+    retry back-off.
+    """
+
+    return (getattr(args, "timeout", None) or CONTROL_PERSIST) + MAX_DELAY
+
+
+async def open_master(
+    system: int,
+    *,
+    control_path: Path,
+    persist: int = CONTROL_PERSIST,
+    user: str | None = None,
+) -> None:
+    """Opens a persistent master connection to the given system."""
+
+    command = [
+        SSH,
+        "-M",
+        "-N",
+        "-f",
+        *_options(
+            *SSH_OPTIONS,
+            *KEEPALIVE_OPTIONS,
+            f"ControlPath={control_path}",
+            f"ControlPersist={persist}",
+        ),
+        get_hostname(system, user=user),
+    ]
+    # The forked master keeps its standard streams open,
+    # so they must not be connected to any pipes of ours.
+    process = await create_subprocess_exec(
+        *command, stdin=DEVNULL, stdout=DEVNULL, stderr=DEVNULL
+    )
+
+    if (returncode := await process.wait()) != 0:
+        raise SSHConnectionError(CompletedProcess(command, returncode, "", ""))
+
+
+async def close_master(
+    system: int, *, control_path: Path, user: str | None = None
+) -> None:
+    """Closes the master connection to the given system."""
+
+    process = await create_subprocess_exec(
+        SSH,
+        *_options(*SSH_OPTIONS, f"ControlPath={control_path}"),
+        "-O",
+        "exit",
+        get_hostname(system, user=user),
+        stdin=DEVNULL,
+        stdout=DEVNULL,
+        stderr=DEVNULL,
+    )
+    await process.wait()
+
+
+def _options(*options: str) -> Iterator[str]:
+    """Yields the options as SSH command line arguments."""
+
+    for option in options:
+        yield "-o"
+        yield option
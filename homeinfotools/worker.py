@@ -1,44 +1,110 @@
-"""Multiprocessing worker."""
+"""Asynchronous worker."""
 
 from argparse import Namespace
+from asyncio import sleep
 from datetime import datetime
-
-from setproctitle import setproctitle
+from itertools import count
+from pathlib import Path
 
 from homeinfotools.exceptions import SSHConnectionError
 from homeinfotools.logging import syslogger
+from homeinfotools.metrics import spans, timed
+from homeinfotools.results import DONE, OFFLINE, ResultsWriter
+from homeinfotools.retry import retry_delay
+from homeinfotools.ssh import close_master, open_master
 
 
 __all__ = ["BaseWorker"]
 
 
 class BaseWorker:
-    """Stored args and manager to process systems."""
+    """Stored args and results to process systems."""
 
     __slots__ = ("args", "results")
 
-    def __init__(self, args: Namespace, results: dict):
+    def __init__(self, args: Namespace, results: ResultsWriter):
         """Sets the command line arguments."""
         self.args = args
         self.results = results
 
-    def __call__(self, system: int):
-        """Processes a single system."""
-        setproctitle(f"hidsltools-worker@{system}")
-        result = {"start": (start := datetime.now()).isoformat()}
+    async def __call__(self, system: int, **kwargs) -> dict:
+        """Processes a single system and returns its result."""
+        start = datetime.now()
 
-        try:
-            result["result"] = self.run(system)
-        except SSHConnectionError:
-            syslogger(system).error("Could not establish SSH connection.")
-            result["online"] = False
-        else:
-            result["online"] = True
-
-        result["end"] = (end := datetime.now()).isoformat()
-        result["duration"] = str(end - start)
+        with spans() as timings:
+            try:
+                result = {
+                    "result": await self.run_multiplexed(system, **kwargs),
+                    "online": True,
+                }
+            except SSHConnectionError:
+                syslogger(system).error("Could not establish SSH connection.")
+                result = {"online": False}
+
+        if timings:
+            result["timings"] = timings
+
+        return self.finish(system, start, result)
+
+    def skip_offline(self, system: int) -> dict:
+        """Records a system that is known to be offline without processing it."""
+        return self.finish(system, datetime.now(), {"online": False})
+
+    def finish(self, system: int, start: datetime, result: dict) -> dict:
+        """Completes the result of the system and writes it."""
+        end = datetime.now()
+        result = {
+            "start": start.isoformat(),
+            **result,
+            "end": end.isoformat(),
+            "duration": str(end - start),
+        }
+        result["status"] = self.get_status(result)
         self.results[system] = result
 
-    def run(self, system: int) -> dict:
+        if (metrics := self.args.run_metrics) is not None:
+            metrics.add(system, (end - start).total_seconds(), result)
+
+        return result
+
+    async def run_multiplexed(self, system: int, **kwargs) -> dict:
+        """Runs the processes over a shared master connection, if enabled."""
+        if (control_path := self.args.control_path) is None:
+            return await self.run(system, **kwargs)
+
+        await self.connect(system, control_path)
+
+        try:
+            return await self.run(system, **kwargs)
+        finally:
+            await close_master(system, control_path=control_path, user=self.args.user)
+
+    async def connect(self, system: int, control_path: Path) -> None:
+        """Opens the master connection, retrying as per the connect policy."""
+        for attempt in count(1):
+            try:
+                with timed("connect", attempt=attempt):
+                    return await open_master(
+                        system,
+                        control_path=control_path,
+                        persist=self.args.control_persist,
+                        user=self.args.user,
+                    )
+            except SSHConnectionError:
+                policies = self.args.retry_policies
+
+                if (delay := retry_delay(policies, "connect", attempt)) is None:
+                    raise
+
+            syslogger(system).warning(
+                "Could not connect. Retrying in %.1f seconds.", delay
+            )
+            await sleep(delay)
+
+    async def run(self, system: int, **kwargs) -> dict:
         """Runs the respective processes."""
         raise NotImplementedError()
+
+    def get_status(self, result: dict) -> str:
+        """Returns the journal status of a processed system."""
+        return DONE if result["online"] else OFFLINE
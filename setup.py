@@ -17,7 +17,7 @@ setup(
     maintainer="Richard Neumann",
     maintainer_email="r.neumann@homeinfo.de",
     python_requires=">=3.8",
-    install_requires=["requests", "setproctitle"],
+    install_requires=["requests"],
     packages=[
         "homeinfotools",
         "homeinfotools.filetransfer",